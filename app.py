@@ -3,8 +3,11 @@ os.environ["STREAMLIT_DISABLE_WATCHDOG_WARN"] = "true"
 os.environ["STREAMLIT_WATCHDOG"] = "false"
 import streamlit as st
 from modules.generator import DeepSeekGenerator
+from modules.retriever import get_offline_retriever
 from modules.utils import preprocess_input, format_output
 from modules.utils import extract_direct_reply 
+from modules.history import DialogueHistory
+from modules.stream_render import StreamRenderer, StreamlitSink
 
 # ---------------- 页面基设 ----------------
 st.set_page_config(page_title="医疗智能问答助手", layout="wide")
@@ -12,10 +15,15 @@ st.title("🩺 医疗智能问答助手")
 st.markdown("请输入症状描述，AI 将结合医学资料与对话历史为您提供建议。")
 
 # ---------------- 会话状态 ----------------
+# history 仅用于页面展示；dialogue 是发给模型的压缩历史
 if "history" not in st.session_state:
     st.session_state.history = []
+if "dialogue" not in st.session_state:
+    st.session_state.dialogue = DialogueHistory()
 
 generator = DeepSeekGenerator()
+# 启动时预加载离线检索器（嵌入模型、索引或检索池），避免首个问题承担加载耗时
+get_offline_retriever()
 
 # ---------------- 工具函数 ----------------
 def stream_and_render(user_input: str):
@@ -24,17 +32,14 @@ def stream_and_render(user_input: str):
 
     # 构造 messages（含历史）
     messages = [{"role": "system", "content": "你是一名医疗助理"}]
-    for h in st.session_state.history:
-        messages.append(h)
+    messages += st.session_state.dialogue.as_messages()
     messages.append({"role": "user", "content": clean_q})
 
     placeholder = st.empty()
-    full_text = ""
 
-    # 1️⃣ 打字机效果
-    for tok in generator.stream_answer(messages, temperature=0.7):
-        full_text += tok
-        placeholder.markdown(full_text + "▌")
+    # 1️⃣ 打字机效果（合并 token 后再刷新）
+    renderer = StreamRenderer(StreamlitSink(placeholder))
+    full_text = renderer.render(generator.stream_answer(messages, temperature=0.7))
 
     # 2️⃣ 结构化解析
     result = format_output(full_text)
@@ -44,18 +49,19 @@ def stream_and_render(user_input: str):
         with st.expander("🗒 查看原始 JSON"):
             st.code(result["raw"], language="json")
 
-    # 3️⃣ 更新历史（保留 3 轮）
+    # 3️⃣ 更新历史（展示保留 3 轮，模型历史按 token 预算压缩）
     st.session_state.history.extend([
         {"role": "user", "content": clean_q},
         {"role": "assistant", "content": full_text}
     ])
     st.session_state.history = st.session_state.history[-6:]
+    st.session_state.dialogue.add_turn(clean_q, full_text)
 
 def nonstream_answer(user_input: str, temp: float):
     """一次性回答，用于参数对比。返回 plain + formatted"""
     raw_json = generator.generate_answer(
         query=user_input,
-        dialogue_history=st.session_state.history,
+        dialogue_history=st.session_state.dialogue.as_messages(),
         temperature=temp
     )
     formatted = format_output(raw_json)
@@ -66,18 +72,16 @@ def nonstream_answer(user_input: str, temp: float):
 
 def stream_and_replace(user_input: str):
     clean_q = preprocess_input(user_input)
-    hist = st.session_state.history
+    hist = st.session_state.dialogue.as_messages()
 
     # ---- 1️⃣ 自然语言流式 ----
     placeholder = st.empty()
-    nat_text = ""
-    for tok in generator.stream_natural_reply(
+    renderer = StreamRenderer(StreamlitSink(placeholder))
+    nat_text = renderer.render(generator.stream_natural_reply(
         query=clean_q,
         dialogue_history=hist,
         temperature=0.7,
-    ):
-        nat_text += tok
-        placeholder.markdown(nat_text + "▌")
+    ))
 
     # ---- 2️⃣ 结构化二次调用（非流式）----
     json_answer = generator.generate_answer(
@@ -107,6 +111,8 @@ def stream_and_replace(user_input: str):
         }
     ])
     st.session_state.history = st.session_state.history[-6:]
+    # 模型历史只存压缩后的自然语言回答，不带 formatted 卡片
+    st.session_state.dialogue.add_turn(clean_q, nat_clean)
 
 
 
@@ -163,6 +169,7 @@ if st.session_state.history:
 # ---------------- 清空按钮 ----------------
 if st.button("🧹 清除对话历史"):
     st.session_state.history = []
+    st.session_state.dialogue.clear()
     st.experimental_rerun()
 
 # ---------------- 免责声明 ----------------
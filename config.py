@@ -10,6 +10,10 @@ load_dotenv()
 class Settings:
     # FAISS 索引文件存放路径
     VECTOR_DB_PATH: str = str(Path(__file__).parent / "data" / "faiss_index")
+    # 去重后的语料（build_faiss.py 生成，BM25 优先加载）
+    DEDUP_CONTEXTS_PATH: str = str(Path(__file__).parent / "data" / "contexts_dedup.json")
+    # 按科室划分的 FAISS 子索引存放路径
+    SHARD_DB_PATH: str = str(Path(__file__).parent / "data" / "faiss_shards")
 
     # 从环境变量中读取 API Key
     DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
@@ -23,4 +27,121 @@ class Settings:
     DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
     DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL")
 
+    # 模型路由：默认模型；FAST_MODEL 非空时简单问题改用它
+    DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "deepseek-ai/DeepSeek-V3")
+    FAST_MODEL = os.getenv("FAST_MODEL")
+    # 模型路由：可用端点（同一模型可配多个端点，供对冲请求使用）
+    LLM_ENDPOINTS = [
+        {"name": "primary", "model": DEFAULT_MODEL,
+         "base_url": DEEPSEEK_BASE_URL, "api_key": DEEPSEEK_API_KEY},
+    ]
+    if os.getenv("BACKUP_BASE_URL"):
+        LLM_ENDPOINTS.append({"name": "backup", "model": DEFAULT_MODEL,
+                              "base_url": os.getenv("BACKUP_BASE_URL"),
+                              "api_key": os.getenv("BACKUP_API_KEY", DEEPSEEK_API_KEY)})
+    if FAST_MODEL:
+        LLM_ENDPOINTS.append({"name": "fast", "model": FAST_MODEL,
+                              "base_url": DEEPSEEK_BASE_URL, "api_key": DEEPSEEK_API_KEY})
+    # 模型路由：用户问题不超过该字数视为简单问题
+    SIMPLE_QUERY_MAX_CHARS = 20
+    # 模型路由：每个端点保留最近多少次调用的延迟/错误记录
+    LLM_STATS_WINDOW = 200
+    # 对冲：首个请求耗时（流式调用为首 token 延迟）超过该端点的第几百分位时发出第二个请求
+    HEDGE_ENABLED = True
+    HEDGE_PERCENTILE = 95
+    # 对冲：样本不足时使用的默认等待时间与等待下限（秒）
+    HEDGE_DEFAULT_DELAY = 15.0
+    HEDGE_MIN_DELAY = 2.0
+    HEDGE_MIN_SAMPLES = 20
+    # 单次 LLM 请求超时（秒）与客户端重试次数
+    LLM_REQUEST_TIMEOUT = 120.0
+    LLM_MAX_RETRIES = 1
+    # 并发 LLM 请求线程数上限
+    LLM_MAX_CONCURRENCY = 64
+    # LLM 请求不复用连接：对冲落败者在响应头到达前也能立即断开（代价是每次多一次握手）；
+    # 关闭后复用的连接上只能等响应头到达再断开。None 表示仅对配置了多个端点的模型开启
+    LLM_CANCEL_BEFORE_HEADERS = None
+
+    # 构建索引时是否做近重复去重（MinHash + LSH）
+    DEDUP_ENABLED = True
+    # 估计 Jaccard 相似度不低于该值视为近重复
+    DEDUP_THRESHOLD = 0.8
+    # MinHash 签名长度 / LSH 分段数（每段 NUM_PERM / BANDS 行）
+    DEDUP_NUM_PERM = 128
+    DEDUP_BANDS = 16
+    # 字符 shingle 长度
+    DEDUP_SHINGLE_SIZE = 4
+
+    # 是否启用科室分片检索（分片目录不存在时自动只用全局索引）
+    USE_DEPARTMENT_SHARDS = True
+    # 文档数少于该值的科室不单独建分片
+    SHARD_MIN_DOCS = 200
+    # 路由：最相似科室质心的最低余弦相似度
+    ROUTER_MIN_SIMILARITY = 0.5
+    # 路由：与第一名相似度差在该范围内的科室一并检索
+    ROUTER_MARGIN = 0.02
+    # 路由：候选科室超过该数目视为不明确，回退全局索引
+    ROUTER_MAX_SHARDS = 2
+
+    # 联网检索：单次百度搜索超时（秒）
+    WEB_SEARCH_TIMEOUT = 5.0
+    # 联网检索：超过该耗时（秒）视为过慢，计入熔断
+    WEB_SLOW_THRESHOLD = 3.0
+    # 联网检索：连续失败/过慢多少次后熔断
+    WEB_BREAKER_FAILURES = 3
+    # 联网检索：熔断冷却时间（秒）
+    WEB_BREAKER_COOLDOWN = 60.0
+    # 联网检索：后台搜索线程数
+    WEB_SEARCH_MAX_WORKERS = 8
+    # 离线向量检索最佳 L2 距离不超过该值时跳过联网（需根据 web_route 日志校准）
+    WEB_SKIP_MAX_DISTANCE = 60.0
+
+    # 查询嵌入微批：开关、单批最大条数、最长等待（毫秒）
+    EMBED_BATCHING = True
+    EMBED_BATCH_MAX_SIZE = 32
+    EMBED_BATCH_MAX_WAIT_MS = 5.0
+    # 查询嵌入微批：每多少个批次输出一次统计日志
+    EMBED_STATS_LOG_EVERY = 500
+
+    # 离线检索工作进程数；0 表示在调用线程内检索
+    RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "0"))
+    # 每个检索工作进程的 PyTorch 线程数（避免多进程间线程争抢）
+    RETRIEVAL_TORCH_THREADS = 1
+
+    # 日志：控制台格式 text / json
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+    # 日志：各组件级别（root 为默认）
+    LOG_LEVELS = {
+        "root": os.getenv("LOG_LEVEL", "INFO"),
+        "modules.utils": "INFO",
+        "modules.generator": "INFO",
+        "modules.web_router": "INFO",
+        "modules.department_router": "INFO",
+        "modules.stream_render": "INFO",
+        "modules.model_router": "INFO",
+        "modules.embed_batcher": "INFO",
+        "httpx": "WARNING",
+    }
+    # 日志：标记为 payload 的大段内容采样率与截断长度
+    LOG_PAYLOAD_SAMPLE_RATE = 0.1
+    LOG_MAX_PAYLOAD_CHARS = 500
+    # 审计日志：完整模型输出写入滚动文件
+    AUDIT_ENABLED = True
+    AUDIT_LOG_PATH: str = str(Path(__file__).parent / "data" / "logs" / "audit.jsonl")
+    AUDIT_MAX_BYTES = 20 * 1024 * 1024
+    AUDIT_BACKUP_COUNT = 5
+
+    # 流式渲染：两次刷新的最小间隔（秒）与触发刷新的累积字数
+    STREAM_FLUSH_INTERVAL = 0.05
+    STREAM_FLUSH_CHARS = 64
+
+    # 对话历史 token 预算（近期回合 + 摘要）
+    HISTORY_TOKEN_BUDGET = 1200
+    # 早期对话摘要的 token 上限
+    HISTORY_SUMMARY_TOKEN_BUDGET = 300
+    # 摘要预算最多占总预算的比例
+    HISTORY_SUMMARY_MAX_RATIO = 0.25
+    # 历史中单条助手回答保留的最大字符数
+    HISTORY_ASSISTANT_MAX_CHARS = 200
+
 settings = Settings()
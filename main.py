@@ -1,12 +1,17 @@
 from modules.retriever import MedicalRetrieverOnline
-from modules.retriever import MedicalRetrieverOffline
+from modules.retriever import get_offline_retriever
 from modules.generator import DeepSeekGenerator
 from modules.utils import preprocess_input, format_output
+from modules.history import DialogueHistory
+from modules.stream_render import StreamRenderer, TerminalSink
+import argparse
 
-def main():
+def main(stream: bool = False):
     # 初始化组件
     generator = DeepSeekGenerator()
-    dialogue_history = []
+    dialogue = DialogueHistory()
+    # 预加载离线检索器，避免首个问题承担模型与索引加载耗时
+    get_offline_retriever()
     print("医疗问答助手已启动，输入'exit'退出对话")
     while True:
         # 用户输入
@@ -18,22 +23,28 @@ def main():
         clean_query = preprocess_input(user_query)
         
         try:
+            if stream:
+                # 流式：自然语言回答边生成边输出
+                print("\n助手: ", end="", flush=True)
+                renderer = StreamRenderer(TerminalSink())
+                reply = renderer.render(generator.stream_natural_reply(
+                    query=clean_query,
+                    dialogue_history=dialogue.as_messages()
+                ))
+                dialogue.add_turn(clean_query, reply)
+                continue
+
             # 生成回答（传入历史对话）
             answer = generator.generate_answer(
                 query=clean_query,
-                dialogue_history=dialogue_history
+                dialogue_history=dialogue.as_messages()
             )
             
             if answer:
                 formatted_answer = format_output(answer)
                 print(f"\n助手: {formatted_answer}")
-                # 更新对话历史（保留最近3轮对话）
-                dialogue_history.extend([
-                    {"role": "user", "content": clean_query},
-                    {"role": "assistant", "content": answer}
-                ])
-                # 保持对话历史不超过6条（3轮）
-                dialogue_history = dialogue_history[-6:]
+                # 更新对话历史（压缩保存，按 token 预算裁剪）
+                dialogue.add_turn(clean_query, answer)
             else:
                 print("\n助手: 暂时无法回答这个问题，请尝试更详细的描述")
                 
@@ -41,4 +52,7 @@ def main():
             print(f"\n系统错误: {str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="医疗问答助手 CLI")
+    parser.add_argument("--stream", action="store_true", help="流式输出自然语言回答")
+    args = parser.parse_args()
+    main(stream=args.stream)
\ No newline at end of file
@@ -0,0 +1,70 @@
+# modules/department_router.py
+
+import json
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+from config import settings
+from modules.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# 分片目录下的清单与质心文件（由 build_faiss.py 生成）
+MANIFEST_FILE = "manifest.json"
+CENTROIDS_FILE = "centroids.npy"
+# 没有科室标注的文档共用一个质心；路由到它时回退全局索引
+UNSHARDED = "__unsharded__"
+
+
+def load_manifest(shard_path: Optional[str] = None) -> Optional[dict]:
+    path = Path(shard_path or settings.SHARD_DB_PATH) / MANIFEST_FILE
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+class DepartmentRouter:
+    """
+    查询 -> 科室 的质心分类器：
+      • 每个科室一个质心（该科室文档嵌入归一化后求均值），没有分片的小科室
+        和无科室文档也有质心
+      • query 嵌入与质心做余弦相似度
+      • 只有最相似的科室足够明确、且都有分片时才路由，否则返回空列表走全局索引
+    """
+
+    def __init__(self, shard_path: Optional[str] = None):
+        shard_path = Path(shard_path or settings.SHARD_DB_PATH)
+        manifest = load_manifest(str(shard_path))
+        if manifest is None:
+            raise FileNotFoundError(f"未找到科室分片清单：{shard_path / MANIFEST_FILE}")
+        self.departments = [d["name"] for d in manifest["departments"]]
+        self.shard_dirs = {d["name"]: str(shard_path / d["dir"])
+                           for d in manifest["departments"]}
+        # 质心顺序与 centroids.npy 的行一致；旧清单只有分片科室的质心
+        self.centroid_names = manifest.get("centroids", self.departments)
+        self.centroids = np.load(shard_path / CENTROIDS_FILE).astype(np.float32)
+
+    def route(self, query_vector) -> List[str]:
+        """返回应检索的科室列表；空列表表示回退到全局索引"""
+        if not self.shard_dirs or self.centroids.size == 0:
+            return []
+        vec = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm == 0:
+            return []
+        sims = self.centroids @ (vec / norm)
+        order = np.argsort(sims)[::-1]
+        best = sims[order[0]]
+        if best < settings.ROUTER_MIN_SIMILARITY:
+            return []
+
+        # 与第一名差距在 margin 内的都视为候选；候选过多说明问题不够聚焦
+        candidates = [self.centroid_names[i] for i in order
+                      if sims[i] >= best - settings.ROUTER_MARGIN]
+        if len(candidates) > settings.ROUTER_MAX_SHARDS:
+            return []
+        # 候选中有没单独建分片的（小科室 / 无科室文档），只有全局索引里有它们
+        if any(name not in self.shard_dirs for name in candidates):
+            return []
+        logger.debug("科室路由：%s（相似度 %.3f）", candidates, best)
+        return candidates
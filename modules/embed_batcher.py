@@ -0,0 +1,122 @@
+# modules/embed_batcher.py
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+from langchain_core.embeddings import Embeddings
+from config import settings
+from modules.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    查询嵌入微批调度：
+      • 各线程提交单条文本，立即拿到 Future
+      • 后台线程收集 max_wait_ms 时间窗内（或满 max_batch 条）的请求，合成一个批次前向
+      • 记录排队延迟、批大小与吞吐，每 EMBED_STATS_LOG_EVERY 个批次输出一次
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]],
+                 max_batch: Optional[int] = None, max_wait_ms: Optional[float] = None):
+        self.embed_fn = embed_fn
+        self.max_batch = max_batch or settings.EMBED_BATCH_MAX_SIZE
+        self.max_wait = (settings.EMBED_BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self._queue = queue.SimpleQueue()
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+        self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def embed(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            batches, queries = self._batches, self._queries
+            return {
+                "batches": batches,
+                "queries": queries,
+                "avg_batch_size": round(queries / batches, 2) if batches else 0.0,
+                "avg_queue_delay_ms": round(self._queue_delay / queries * 1000, 2) if queries else 0.0,
+                "busy_qps": round(queries / self._busy, 1) if self._busy else 0.0,
+            }
+
+    def _reset_stats(self):
+        self._batches = 0
+        self._queries = 0
+        self._queue_delay = 0.0
+        self._busy = 0.0
+
+    def _collect(self):
+        """收集一个批次；调用方已取消的请求直接丢弃"""
+        batch = []
+        item = self._queue.get()
+        deadline = time.perf_counter() + self.max_wait
+        while True:
+            # 标记为运行中后调用方无法再取消，之后可以安全地写入结果
+            if item[1].set_running_or_notify_cancel():
+                batch.append(item)
+            if len(batch) >= self.max_batch:
+                break
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                vectors = self.embed_fn([text for text, _, _ in batch])
+                if len(vectors) != len(batch):
+                    raise ValueError(f"嵌入结果数 {len(vectors)} 与批大小 {len(batch)} 不一致")
+                for (_, future, _), vec in zip(batch, vectors):
+                    future.set_result(vec)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            end = time.perf_counter()
+
+            with self._stats_lock:
+                self._batches += 1
+                self._queries += len(batch)
+                self._queue_delay += sum(start - enqueued for _, _, enqueued in batch)
+                self._busy += end - start
+                log_now = self._batches % settings.EMBED_STATS_LOG_EVERY == 0
+            if log_now:
+                logger.info("embed_batcher", extra={"fields": self.stats()})
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    包装 LangChain 嵌入模型：embed_query 走微批调度，embed_documents 原样透传。
+    可直接作为 FAISS 的 embedding_function 使用。
+    """
+
+    def __init__(self, base: Embeddings, max_batch: Optional[int] = None,
+                 max_wait_ms: Optional[float] = None):
+        self.base = base
+        self.batcher = EmbeddingBatcher(base.embed_documents, max_batch, max_wait_ms)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.batcher.embed(text)
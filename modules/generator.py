@@ -3,25 +3,31 @@
 from typing import Optional
 from pathlib import Path
 import json
-from openai import OpenAI
 from config import settings
-from modules.utils import logger, validate_json
+from modules.utils import validate_json, clean_json_text
+from modules.logging_utils import get_logger, audit
 from modules.retriever import MedicalRetrieverOnline
-from modules.retriever import MedicalRetrieverOffline
+from modules.retriever import get_offline_retriever
+from modules.web_router import web_router
+from modules.model_router import model_router
 from typing import Optional, List, Dict
 
-client_deepseek = OpenAI(
-    base_url=settings.DEEPSEEK_BASE_URL,
-    api_key=settings.DEEPSEEK_API_KEY
-)
+logger = get_logger(__name__)
 
-def get_response(messages, model="deepseek-ai/DeepSeek-V3", temperature=0.7):
-    resp = client_deepseek.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=temperature
-    )
-    return resp.choices[0].message.content
+def get_response(messages, model: Optional[str] = None, temperature=0.7):
+    """非流式调用；未指定 model 时由 model_router 选择模型与端点（含对冲）"""
+    return model_router.complete(messages, model=model, temperature=temperature)
+
+def retrieve_contexts(query: str, top_k: int):
+    """
+    先离线检索，再由 web_router 按离线得分等决定是否联网。
+    返回 (网页 contexts, 手册 contexts, 路由决策)
+    """
+    offline_docs, offline_score = get_offline_retriever().hybrid_retrieve_with_score(query, top_k=top_k)
+    web_docs, decision = web_router.search(MedicalRetrieverOnline(), query, offline_score, top_k=top_k)
+    return ([doc.page_content for doc in web_docs],
+            [doc.page_content for doc in offline_docs],
+            decision)
 
 class DeepSeekGenerator:
     @staticmethod
@@ -29,7 +35,7 @@ class DeepSeekGenerator:
         query: str,
         dialogue_history: List[Dict], 
         top_k: int = 50,
-        model: str = "deepseek-ai/DeepSeek-V3",
+        model: Optional[str] = None,
         temperature: float = 0.7
     ) -> Optional[str]:
         try:
@@ -40,14 +46,8 @@ class DeepSeekGenerator:
                 "possible_causes": [],
                 "recommended_department": "无"
             }
-            # 1. 用检索器挑出 top_k 条最相关的 contexts
-            retriever1 = MedicalRetrieverOnline()
-            retriever2 = MedicalRetrieverOffline()
-            docs1 = retriever1.hybrid_retrieve(query, top_k=top_k)
-            docs2 = retriever2.hybrid_retrieve(query, top_k=top_k)
-            contexts1 = [doc.page_content for doc in docs1]
-            contexts2 = [doc.page_content for doc in docs2]
-            # contexts2 = []
+            # 1. 用检索器挑出 top_k 条最相关的 contexts（必要时才联网）
+            contexts1, contexts2, decision = retrieve_contexts(query, top_k)
             # 2. 构建带历史上下文的prompt
             joined_contexts1 = "\n".join(f"- {ctx}" for ctx in contexts1)
             joined_contexts2 = "\n".join(f"- {ctx}" for ctx in contexts2)
@@ -105,8 +105,13 @@ class DeepSeekGenerator:
             temp = temperature
             while attempt < 3:
                 result = get_response(messages, model=model, temperature=temp)
-                logger.info("🟢 原始模型输出:\n%s", result)
+                logger.info("🟢 原始模型输出:\n%s", result, extra={"payload": True})
+                audit("model_output", model=model or "routed", attempt=attempt, output=result)
                 if validate_json(result):
+                    # 与路由决策一并记录回答置信度，用于评估跳过联网对质量的影响
+                    confidence = json.loads(clean_json_text(result)).get("confidence")
+                    logger.info("web_route_quality",
+                                extra={"fields": {**decision, "confidence": confidence}})
                     return result
                 attempt += 1
                 temp = max(0.5, temp - 0.2)
@@ -123,40 +128,29 @@ class DeepSeekGenerator:
     @staticmethod
     def stream_answer(
         messages,
-        model: str = "deepseek-ai/DeepSeek-V3",
+        model: Optional[str] = None,
         temperature: float = 0.7,
     ):
         """
         按 token 流式产出，用于打字机效果。
         调用方式与 generate_answer 保持同一 messages 结构。
         """
-        resp = client_deepseek.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=temperature,
-            stream=True,          # 关键参数
-        )
-        for chunk in resp:
-            if chunk.choices and chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+        yield from model_router.stream(messages, model=model, temperature=temperature)
                 
     @staticmethod
     def stream_natural_reply(
         query: str,
         dialogue_history,
-        model: str = "deepseek-ai/DeepSeek-V3",
+        model: Optional[str] = None,
         temperature: float = 0.7,
     ):
         """
         与 stream_generate_answer 相同检索，但要求模型只用自然语言回复。
         """
         # --- 检索与 system_content 与 stream_generate_answer 相同 ---
-        retriever1 = MedicalRetrieverOnline()
-        retriever2 = MedicalRetrieverOffline()
-        ctx1 = "\n".join(f"- {d.page_content}"
-                         for d in retriever1.hybrid_retrieve(query, top_k=20))
-        ctx2 = "\n".join(f"- {d.page_content}"
-                         for d in retriever2.hybrid_retrieve(query, top_k=20))
+        contexts1, contexts2, _ = retrieve_contexts(query, top_k=20)
+        ctx1 = "\n".join(f"- {c}" for c in contexts1)
+        ctx2 = "\n".join(f"- {c}" for c in contexts2)
 
         system_content = (
             "你是一名专业医疗助理，正在进行多轮对话。\n"
@@ -169,14 +163,6 @@ class DeepSeekGenerator:
         messages += dialogue_history
         messages.append({"role": "user", "content": query})
 
-        resp = client_deepseek.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=temperature,
-            stream=True,
-        )
-        for chunk in resp:
-            if chunk.choices and chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+        yield from model_router.stream(messages, model=model, temperature=temperature)
 
 
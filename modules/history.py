@@ -0,0 +1,184 @@
+# modules/history.py
+
+import re
+import json
+from typing import List, Dict, Optional
+from config import settings
+from modules.utils import clean_json_text
+
+# 中日韩字符及全角标点，粗略按 1 字 ≈ 1 token 计
+_CJK_PATTERN = re.compile(r"[　-〿一-鿿＀-￯]")
+
+# 每条消息的固定开销（role、分隔符等）
+_MESSAGE_OVERHEAD = 4
+
+# 摘要以一条 system 消息放在历史最前面
+_SUMMARY_PREFIX = "【早期对话摘要】\n"
+
+# 更早的回合只保留用户问题要点；超预算时逐级缩短每个要点，最后才丢弃最早的
+_TOPIC_CHARS = (16, 8, 4)
+_TOPICS_PREFIX = "- 更早问过："
+
+# 摘要预算下限：摘要前缀 + 消息开销之外至少还能放下一条要点
+_MIN_SUMMARY_TOKENS = 25
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中文按字计，其余字符约 4 个算 1 个"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    rest = len(text) - cjk
+    return cjk + (rest + 3) // 4
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = re.sub(r"\s+", " ", text or "").strip()
+    return text if len(text) <= max_chars else text[:max_chars] + "…"
+
+
+def compact_assistant_content(answer: str, max_chars: Optional[int] = None) -> str:
+    """
+    把助手回答压缩成适合放进历史的短文本：
+      • JSON 回答只保留 direct_reply + 风险等级 / 建议科室 / 可能原因名称
+      • 自然语言回答直接截断
+    """
+    max_chars = max_chars or settings.HISTORY_ASSISTANT_MAX_CHARS
+    if not answer:
+        return ""
+    try:
+        data = json.loads(clean_json_text(answer))
+    except Exception:
+        return _clip(answer, max_chars)
+    if not isinstance(data, dict):
+        return _clip(answer, max_chars)
+
+    parts = [data.get("direct_reply") or data.get("answer") or ""]
+    if data.get("risk_level"):
+        parts.append(f"风险：{data['risk_level']}")
+    if data.get("recommended_department"):
+        parts.append(f"建议科室：{data['recommended_department']}")
+    causes = data.get("possible_causes") or []
+    if isinstance(causes, list) and causes:
+        names = [c.get("name", "") if isinstance(c, dict) else str(c) for c in causes]
+        parts.append("可能原因：" + "、".join(n for n in names if n))
+    return _clip("｜".join(p for p in parts if p), max_chars)
+
+
+class DialogueHistory:
+    """
+    多轮对话历史管理：
+      • 助手回合以压缩形式保存
+      • 按 token 预算而非条数裁剪
+      • 被挤出的旧回合增量写入摘要，而不是直接丢弃；
+        摘要超预算时把最早的摘要行合并成问题要点并逐级压缩
+    """
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        summary_budget: Optional[int] = None,
+    ):
+        self.token_budget = token_budget or settings.HISTORY_TOKEN_BUDGET
+        # 摘要最多占总预算的 HISTORY_SUMMARY_MAX_RATIO（预算很小时至少能放下一条要点，
+        # 但不超过总预算的一半），给近期回合留出空间
+        self.summary_budget = min(
+            summary_budget or settings.HISTORY_SUMMARY_TOKEN_BUDGET,
+            max(int(self.token_budget * settings.HISTORY_SUMMARY_MAX_RATIO), _MIN_SUMMARY_TOKENS),
+            self.token_budget // 2,
+        )
+        self.turns: List[Dict] = []
+        # 摘要行：(用户问题, 摘要文本)；更早的只剩问题要点
+        self._summary_lines: List[tuple] = []
+        self._topics: List[str] = []
+        self._topic_level = 0
+
+    # ---------------- 写入 ----------------
+    def add_turn(self, user_content: str, assistant_content: str):
+        """追加一轮对话（用户问题 + 助手回答），随后按预算压缩"""
+        self.turns.append({"role": "user", "content": self._clip_side(user_content)})
+        self.turns.append({
+            "role": "assistant",
+            "content": self._clip_side(compact_assistant_content(assistant_content)),
+        })
+        self._compact()
+
+    def clear(self):
+        self.turns = []
+        self._summary_lines = []
+        self._topics = []
+        self._topic_level = 0
+
+    # ---------------- 读取 ----------------
+    @property
+    def summary(self) -> str:
+        lines = []
+        if self._topics:
+            chars = _TOPIC_CHARS[self._topic_level]
+            lines.append(_TOPICS_PREFIX + "；".join(_clip(t, chars) for t in self._topics))
+        lines.extend(line for _, line in self._summary_lines)
+        return "\n".join(lines)
+
+    def as_messages(self) -> List[Dict]:
+        """返回可直接拼进 messages 的历史（摘要在前，近期回合在后）"""
+        messages = []
+        summary = self.summary
+        if summary:
+            messages.append({
+                "role": "system",
+                "content": _SUMMARY_PREFIX + summary,
+            })
+        messages.extend(dict(t) for t in self.turns)
+        return messages
+
+    def token_count(self) -> int:
+        return sum(estimate_tokens(m["content"]) + _MESSAGE_OVERHEAD
+                   for m in self.as_messages())
+
+    def __len__(self):
+        return len(self.turns)
+
+    # ---------------- 压缩 ----------------
+    def _compact(self):
+        # 至少保留最近一轮原样，超预算时把最早一轮折叠进摘要
+        while len(self.turns) > 2 and self.token_count() > self.token_budget:
+            user_msg, assistant_msg = self.turns[0], self.turns[1]
+            self.turns = self.turns[2:]
+            self._summary_lines.append(
+                (user_msg["content"], self._digest(user_msg, assistant_msg)))
+            self._trim_summary()
+
+    def _trim_summary(self):
+        """
+        摘要超预算时依次：把最早的摘要行并入问题要点 -> 缩短每个要点 -> 丢弃最早的要点
+        """
+        while estimate_tokens(_SUMMARY_PREFIX + self.summary) + _MESSAGE_OVERHEAD > self.summary_budget:
+            if self._summary_lines:
+                question, _ = self._summary_lines.pop(0)
+                self._topics.append(_clip(question, _TOPIC_CHARS[0]))
+            elif self._topic_level < len(_TOPIC_CHARS) - 1:
+                self._topic_level += 1
+            elif len(self._topics) > 1:
+                self._topics.pop(0)
+            else:
+                self._topics = []
+                break
+
+    def _turn_side_limit(self) -> int:
+        """
+        最近一轮的单侧（问题或回答）token 上限：两侧合计不超过
+        (总预算 - 摘要预算)，保证最近一轮连同摘要不超出总预算
+        """
+        return max(2, (self.token_budget - self.summary_budget) // 2 - _MESSAGE_OVERHEAD)
+
+    def _clip_side(self, content: str) -> str:
+        limit = self._turn_side_limit()
+        if estimate_tokens(content) <= limit:
+            return content
+        # _clip 后每个字符至多计 1 个 token，省略号另计 1 个
+        return _clip(content, limit - 1)
+
+    @staticmethod
+    def _digest(user_msg: Dict, assistant_msg: Dict) -> str:
+        return (f"- 用户：{_clip(user_msg['content'], 40)} → "
+                f"助手：{_clip(assistant_msg['content'], 60)}")
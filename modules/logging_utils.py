@@ -0,0 +1,154 @@
+# modules/logging_utils.py
+
+import json
+import queue
+import random
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from config import settings
+
+# 审计日志专用 logger：完整记录模型输出，不截断、不采样、不向上传播
+AUDIT_LOGGER = "audit"
+
+_listeners = []
+_setup_lock = threading.Lock()
+_configured = False
+
+
+class TextFormatter(logging.Formatter):
+    """控制台可读格式；结构化字段以 JSON 附在消息后"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        text = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " " + json.dumps(fields, ensure_ascii=False, default=str)
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """一行一个 JSON 对象的结构化日志"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class PayloadFilter(logging.Filter):
+    """
+    热路径上的大段内容处理：
+      • extra={"payload": True} 的记录按 LOG_PAYLOAD_SAMPLE_RATE 采样
+      • 超长字符串参数截断到 LOG_MAX_PAYLOAD_CHARS
+    """
+
+    def filter(self, record):
+        if getattr(record, "payload", False) and random.random() >= settings.LOG_PAYLOAD_SAMPLE_RATE:
+            return False
+        limit = settings.LOG_MAX_PAYLOAD_CHARS
+        if isinstance(record.args, tuple):
+            record.args = tuple(
+                f"{a[:limit]}…（共 {len(a)} 字）" if isinstance(a, str) and len(a) > limit else a
+                for a in record.args
+            )
+        return True
+
+
+class _LazyRotatingFileHandler(RotatingFileHandler):
+    """首条记录写出时才创建目录并打开文件：仅导入模块不会写磁盘"""
+
+    def __init__(self, path: Path, **kwargs):
+        super().__init__(path, delay=True, **kwargs)
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
+def _audit_file_handler(path: Path) -> logging.Handler:
+    handler = _LazyRotatingFileHandler(
+        path,
+        maxBytes=settings.AUDIT_MAX_BYTES,
+        backupCount=settings.AUDIT_BACKUP_COUNT,
+        encoding="utf-8",
+    )
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """只把记录放入无界队列；格式化与写出都在监听线程完成"""
+
+    def prepare(self, record):
+        return record
+
+
+def _start_listener(handler: logging.Handler) -> QueueHandler:
+    q = queue.SimpleQueue()
+    listener = QueueListener(q, handler, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    return _NonBlockingQueueHandler(q)
+
+
+def _stop_listeners():
+    # 退出前把队列中剩余的记录写完
+    for listener in _listeners:
+        listener.stop()
+    _listeners.clear()
+
+
+def setup_logging():
+    """配置异步日志（可重复调用，仅首次生效）"""
+    global _configured
+    with _setup_lock:
+        if _configured:
+            return
+        _configured = True
+
+        console = logging.StreamHandler()
+        console.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+        queue_handler = _start_listener(console)
+        queue_handler.addFilter(PayloadFilter())
+
+        root = logging.getLogger()
+        root.handlers = [queue_handler]
+        for name, level in settings.LOG_LEVELS.items():
+            logging.getLogger(None if name == "root" else name).setLevel(level)
+
+        audit_logger = logging.getLogger(AUDIT_LOGGER)
+        audit_logger.propagate = False
+        audit_logger.setLevel(logging.INFO)
+        if settings.AUDIT_ENABLED:
+            file_handler = _audit_file_handler(Path(settings.AUDIT_LOG_PATH))
+            audit_logger.addHandler(_start_listener(file_handler))
+        else:
+            audit_logger.disabled = True
+
+        atexit.register(_stop_listeners)
+
+
+def get_logger(name: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(name)
+
+
+def audit(event: str, **fields):
+    """把完整内容（如模型原始输出）写入滚动审计文件"""
+    logging.getLogger(AUDIT_LOGGER).info(event, extra={"fields": fields})
@@ -0,0 +1,377 @@
+# modules/model_router.py
+
+import time
+import socket
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional
+from openai import OpenAI, DefaultHttpxClient
+from config import settings
+from modules.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# 当前线程正在发起的请求句柄（httpx 请求钩子在发起请求的线程内执行）
+_local = threading.local()
+
+
+class RequestCancelled(Exception):
+    """对冲请求中落败的一方被主动取消"""
+
+
+class EndpointStats:
+    """滚动窗口内的延迟与错误率"""
+
+    def __init__(self, window: int):
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: Optional[float], ok: bool):
+        with self._lock:
+            self._outcomes.append(ok)
+            if ok and latency is not None:
+                self._latencies.append(latency)
+
+    @property
+    def samples(self) -> int:
+        return len(self._latencies)
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            return (self._outcomes.count(False) / len(self._outcomes)) if self._outcomes else 0.0
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._latencies:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class _Attempt:
+    """
+    单次请求的取消句柄：
+      • 响应头到达前：关闭 trace 记下的底层 socket，阻塞中的读立即返回
+      • 响应头到达后：关闭响应流
+    """
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.cancelled_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._socket = None
+        self._stream = None
+
+    def trace(self, event: str, info: dict):
+        # httpcore trace 回调：新建连接时记下底层 socket（TLS 也建立在它之上）
+        if event == "connection.connect_tcp.complete":
+            sock = info["return_value"].get_extra_info("socket")
+            with self._lock:
+                self._socket = sock
+            if self.cancelled.is_set():
+                self._shutdown(sock)
+
+    def attach_stream(self, stream):
+        with self._lock:
+            self._stream = stream
+        if self.cancelled.is_set():
+            self._close(stream)
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled_at = time.perf_counter()
+            self.cancelled.set()
+            sock, stream = self._socket, self._stream
+        if sock is not None:
+            self._shutdown(sock)
+        elif stream is not None:
+            # 复用的连接拿不到 socket，只能在响应头到达后关闭响应
+            self._close(stream)
+
+    @staticmethod
+    def _shutdown(sock):
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _close(stream):
+        try:
+            stream.response.close()
+        except Exception:
+            pass
+
+
+def _bind_attempt(request):
+    """httpx 请求钩子：把当前线程的取消句柄挂到请求的 trace 上"""
+    attempt = getattr(_local, "attempt", None)
+    if attempt is None:
+        return
+    if attempt.cancelled.is_set():
+        # 已取消的请求不再发出（包括客户端自动重试）
+        raise RequestCancelled("cancelled before send")
+    request.extensions["trace"] = attempt.trace
+
+
+class Endpoint:
+    def __init__(self, name: str, model: str, base_url: Optional[str], api_key: Optional[str],
+                 close_connections: bool = False):
+        self.name = name
+        self.model = model
+        self.client = OpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            timeout=settings.LLM_REQUEST_TIMEOUT,
+            max_retries=settings.LLM_MAX_RETRIES,
+            # 不复用连接时每个请求都能拿到自己的 socket，落败者在响应头前也能断开
+            default_headers={"Connection": "close"} if close_connections else None,
+            http_client=DefaultHttpxClient(event_hooks={"request": [_bind_attempt]}),
+        )
+        self.stats = EndpointStats(settings.LLM_STATS_WINDOW)
+        # 流式调用的首 token 延迟，用于流式对冲
+        self.ttft = EndpointStats(settings.LLM_STATS_WINDOW)
+
+    def score(self) -> float:
+        """越小越优先：中位延迟按错误率加权；没有任何记录时优先试探，只有失败记录的排最后"""
+        p50 = self.stats.percentile(50)
+        if p50 is None:
+            return float("inf") if self.stats.error_rate > 0 else 0.0
+        return p50 * (1 + 5 * self.stats.error_rate)
+
+
+class ModelRouter:
+    """
+    按滚动延迟 / 错误率在模型与端点间路由：
+      • 简单问题（用户问题较短）在配置了 FAST_MODEL 时交给快模型
+      • 同一模型有多个端点时选择当前得分最好的
+      • 非流式调用超过该端点延迟的 HEDGE_PERCENTILE 分位仍未返回、
+        流式调用超过首 token 延迟的该分位仍无输出时，向次优端点发出对冲请求，
+        先返回者胜出，落败者立即断开连接并把已耗时记为删失样本
+    """
+
+    def __init__(self, endpoints: Optional[List[Dict]] = None, hedging: Optional[bool] = None):
+        configs = endpoints or settings.LLM_ENDPOINTS
+        self.hedging = settings.HEDGE_ENABLED if hedging is None else hedging
+        per_model = Counter(cfg["model"] for cfg in configs)
+        self.endpoints = [
+            Endpoint(**cfg, close_connections=self._close_connections(per_model[cfg["model"]]))
+            for cfg in configs
+        ]
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.LLM_MAX_CONCURRENCY,
+            thread_name_prefix="llm",
+        )
+        self._lock = threading.Lock()
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        # 首个请求很快失败后转投其他端点的次数（不论是否开启对冲）
+        self.failovers = 0
+
+    @staticmethod
+    def _close_connections(endpoint_count: int) -> bool:
+        # 未显式配置时，只有同一模型有多个端点（可能对冲 / 转投）才放弃连接复用
+        if settings.LLM_CANCEL_BEFORE_HEADERS is None:
+            return endpoint_count > 1
+        return settings.LLM_CANCEL_BEFORE_HEADERS
+
+    # ---------------- 路由 ----------------
+    def pick_model(self, messages: List[Dict], model: Optional[str] = None) -> str:
+        if model:
+            return model
+        if settings.FAST_MODEL and self._is_simple(messages):
+            return settings.FAST_MODEL
+        return settings.DEFAULT_MODEL
+
+    @staticmethod
+    def _is_simple(messages: List[Dict]) -> bool:
+        users = [m for m in messages if m.get("role") == "user"]
+        return bool(users) and len(users[-1].get("content", "")) <= settings.SIMPLE_QUERY_MAX_CHARS
+
+    def ranked_endpoints(self, model: str) -> List[Endpoint]:
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.model == model]
+            if not candidates:
+                # 未配置的模型：沿用第一个端点的连接
+                base = self.endpoints[0]
+                candidates = [Endpoint(f"{base.name}:{model}", model,
+                                       str(base.client.base_url), base.client.api_key,
+                                       close_connections=self._close_connections(1))]
+                self.endpoints.extend(candidates)
+        return sorted(candidates, key=lambda e: e.score())
+
+    def hedge_delay(self, endpoint: Endpoint, first_token: bool = False) -> float:
+        stats = endpoint.ttft if first_token else endpoint.stats
+        if stats.samples < settings.HEDGE_MIN_SAMPLES:
+            return settings.HEDGE_DEFAULT_DELAY
+        return max(settings.HEDGE_MIN_DELAY, stats.percentile(settings.HEDGE_PERCENTILE))
+
+    # ---------------- 对冲 ----------------
+    def _race(self, model: str, fn, messages, temperature, first_token: bool = False):
+        """
+        向最优端点发起 fn，超过对冲阈值（或很快失败）时向次优端点再发一次。
+        返回 (胜出结果, 胜出端点, 是否对冲)；落败者被取消。
+        """
+        ranked = self.ranked_endpoints(model)
+        primary = ranked[0]
+        backup = ranked[1] if len(ranked) > 1 else primary
+
+        attempts = {}
+        first = self._submit(fn, primary, messages, temperature)
+        attempts[first[0]] = (primary, first[1])
+        delay = self.hedge_delay(primary, first_token) if self.hedging else None
+        done, _ = wait([first[0]], timeout=delay)
+        # 超过阈值未返回时发出对冲请求；首个请求很快失败且有其他端点可用时转投备用端点
+        failed_fast = bool(done) and first[0].exception() is not None and backup is not primary
+        hedge = self.hedging and not done
+        if hedge or failed_fast:
+            with self._lock:
+                if hedge:
+                    self.hedges_fired += 1
+                else:
+                    self.failovers += 1
+            second = self._submit(fn, backup, messages, temperature)
+            attempts[second[0]] = (backup, second[1])
+
+        pending = set(attempts)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                # 胜出：取消其余请求（关闭 socket / 响应流，服务端随即停止生成）；
+                # 同时完成的落败者也要取消，以免流式调用留下未关闭的连接
+                for other, (_, attempt) in attempts.items():
+                    if other is not future:
+                        attempt.cancel()
+                hedged = len(attempts) > 1
+                if hedge and future is not first[0]:
+                    with self._lock:
+                        self.hedges_won += 1
+                return future.result(), attempts[future][0], hedged
+        raise error
+
+    def _submit(self, fn, endpoint: Endpoint, messages, temperature):
+        attempt = _Attempt()
+        future = self._executor.submit(fn, endpoint, messages, temperature, attempt)
+        return future, attempt
+
+    @staticmethod
+    def _open(endpoint: Endpoint, messages, temperature, attempt: _Attempt):
+        """在当前线程发起流式请求；请求钩子据此把 socket 登记到 attempt"""
+        _local.attempt = attempt
+        try:
+            stream = endpoint.client.chat.completions.create(
+                model=endpoint.model,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
+            )
+        finally:
+            _local.attempt = None
+        attempt.attach_stream(stream)
+        return stream
+
+    @staticmethod
+    def _record_cancelled(endpoint: Endpoint, attempt: _Attempt, start: float,
+                          first_token: bool = False):
+        # 落败者真实延迟不低于被取消时的已耗时：按删失样本记入，卡住的端点得分随之变差
+        elapsed = attempt.cancelled_at - start
+        endpoint.stats.record(elapsed, ok=True)
+        if first_token:
+            endpoint.ttft.record(elapsed, ok=True)
+
+    # ---------------- 非流式（可对冲） ----------------
+    def complete(self, messages: List[Dict], model: Optional[str] = None,
+                 temperature: float = 0.7) -> str:
+        model = self.pick_model(messages, model)
+        start = time.perf_counter()
+        text, winner, hedged = self._race(model, self._attempt, messages, temperature)
+        logger.info("llm_call", extra={"fields": {
+            "model": model, "endpoint": winner.name, "hedged": hedged,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        }})
+        return text
+
+    @classmethod
+    def _attempt(cls, endpoint: Endpoint, messages, temperature, attempt: _Attempt) -> str:
+        # 内部用流式请求，便于落败时关闭连接、让服务端停止生成
+        start = time.perf_counter()
+        parts = []
+        try:
+            with cls._open(endpoint, messages, temperature, attempt) as stream:
+                for chunk in stream:
+                    if attempt.cancelled.is_set():
+                        break
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+        except Exception as e:
+            if not attempt.cancelled.is_set():
+                endpoint.stats.record(None, ok=False)
+                raise
+            cls._record_cancelled(endpoint, attempt, start)
+            raise RequestCancelled(endpoint.name) from e
+        if attempt.cancelled.is_set():
+            cls._record_cancelled(endpoint, attempt, start)
+            raise RequestCancelled(endpoint.name)
+        endpoint.stats.record(time.perf_counter() - start, ok=True)
+        return "".join(parts)
+
+    # ---------------- 流式（按首 token 对冲） ----------------
+    def stream(self, messages: List[Dict], model: Optional[str] = None,
+               temperature: float = 0.7):
+        model = self.pick_model(messages, model)
+        (stream, chunks, first, start), endpoint, hedged = self._race(
+            model, self._first_token, messages, temperature, first_token=True)
+        logger.info("llm_stream", extra={"fields": {
+            "model": model, "endpoint": endpoint.name, "hedged": hedged,
+        }})
+        try:
+            with stream:
+                if first:
+                    yield first
+                for chunk in chunks:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+        except GeneratorExit:
+            # 调用方提前结束：不计入统计
+            raise
+        except Exception:
+            endpoint.stats.record(None, ok=False)
+            raise
+        endpoint.stats.record(time.perf_counter() - start, ok=True)
+
+    @classmethod
+    def _first_token(cls, endpoint: Endpoint, messages, temperature, attempt: _Attempt):
+        """发起流式请求并读到第一段内容，返回 (stream, 剩余 chunk 迭代器, 首段内容, 开始时间)"""
+        start = time.perf_counter()
+        try:
+            stream = cls._open(endpoint, messages, temperature, attempt)
+            chunks = iter(stream)
+            first = ""
+            for chunk in chunks:
+                if attempt.cancelled.is_set():
+                    break
+                if chunk.choices and chunk.choices[0].delta.content:
+                    first = chunk.choices[0].delta.content
+                    break
+        except Exception as e:
+            if not attempt.cancelled.is_set():
+                endpoint.stats.record(None, ok=False)
+                raise
+            cls._record_cancelled(endpoint, attempt, start, first_token=True)
+            raise RequestCancelled(endpoint.name) from e
+        if attempt.cancelled.is_set():
+            stream.close()
+            cls._record_cancelled(endpoint, attempt, start, first_token=True)
+            raise RequestCancelled(endpoint.name)
+        endpoint.ttft.record(time.perf_counter() - start, ok=True)
+        return stream, chunks, first, start
+
+
+model_router = ModelRouter()
@@ -0,0 +1,88 @@
+# modules/retrieval_pool.py
+
+import multiprocessing as mp
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, List, Optional
+from config import settings
+
+# 每个工作进程各自持有一个检索器，进程启动时初始化一次
+_worker_retriever = None
+
+
+def _load_offline_retriever(torch_threads: int):
+    import torch
+    torch.set_num_threads(torch_threads)
+    from modules.retriever import MedicalRetrieverOffline
+    # FAISS 向量以只读 mmap 加载，各进程共享页缓存而不是各自复制一份；
+    # docstore（index.pkl）与 BM25 仍由每个进程各自加载、各占一份内存。
+    # 工作进程一次只处理一个请求，微批调度没有意义
+    return MedicalRetrieverOffline(mmap_index=True, batch_queries=False)
+
+
+def _init_worker(factory: Callable, torch_threads: int):
+    global _worker_retriever
+    # 审计日志只由主进程写：多个进程同时轮转同一个文件会损坏日志。
+    # 须在导入 modules.*（触发日志配置）之前关闭
+    settings.AUDIT_ENABLED = False
+    _worker_retriever = factory(torch_threads)
+
+
+def _worker_call(method: str, *args):
+    return getattr(_worker_retriever, method)(*args)
+
+
+def _ping():
+    return _worker_retriever is not None
+
+
+class RetrievalPool:
+    """
+    多进程离线检索池：
+      • 每个工作进程加载一次嵌入模型和检索器：FAISS 向量经 mmap 跨进程共享，
+        docstore 与 BM25 每个进程各有一份（内存随进程数线性增长）
+      • 查询通过本机进程间队列分发，吞吐随核数扩展
+      • hybrid_retrieve 与 MedicalRetrieverOffline 同签名，可直接替换
+    factory(torch_threads) 在工作进程内创建检索器，须可被 pickle（模块级函数）。
+    """
+
+    def __init__(self, workers: int, torch_threads: Optional[int] = None,
+                 factory: Callable = _load_offline_retriever):
+        self.workers = workers
+        torch_threads = torch_threads or settings.RETRIEVAL_TORCH_THREADS
+        # spawn：避免 fork 带入父进程的 PyTorch/OpenMP 线程状态
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(factory, torch_threads),
+        )
+
+    def warmup(self):
+        """提前拉起全部工作进程并完成模型加载"""
+        futures = [self._executor.submit(_ping) for _ in range(self.workers)]
+        return all(f.result() for f in futures)
+
+    def submit(self, query: str, top_k: int = 5) -> Future:
+        return self._executor.submit(_worker_call, "hybrid_retrieve", query, top_k)
+
+    def hybrid_retrieve(self, query: str, top_k: int = 5):
+        return self.submit(query, top_k).result()
+
+    def hybrid_retrieve_with_score(self, query: str, top_k: int = 5):
+        return self._executor.submit(
+            _worker_call, "hybrid_retrieve_with_score", query, top_k).result()
+
+    def hybrid_retrieve_many(self, queries: List[str], top_k: int = 5):
+        """按工作进程数切块，各进程内再走批量检索"""
+        if not queries:
+            return []
+        size = -(-len(queries) // self.workers)
+        futures = [
+            self._executor.submit(_worker_call, "hybrid_retrieve_many",
+                                  queries[i:i + size], top_k)
+            for i in range(0, len(queries), size)
+        ]
+        return [docs for f in futures for docs in f.result()]
+
+    def close(self):
+        self._executor.shutdown(wait=True)
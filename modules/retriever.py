@@ -1,5 +1,9 @@
 import json
+import pickle
+import threading
 from pathlib import Path
+from typing import List, Optional
+import numpy as np
 from langchain.schema import Document
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
@@ -7,29 +11,73 @@ from langchain_community.retrievers import BM25Retriever
 from config import settings
 import torch
 from modules.web_searcher import BaiduSearcher
+from modules.department_router import DepartmentRouter, load_manifest
+from modules.embed_batcher import BatchedEmbeddings
 
 class MedicalRetrieverOffline:
-    def __init__(self):
+    def __init__(self, mmap_index: bool = False, batch_queries: Optional[bool] = None):
         # 1. 初始化嵌入模型（用 GPU 如果可用）
         device = "cuda" if torch.cuda.is_available() else "cpu"
         self.embeddings = HuggingFaceEmbeddings(
             model_name=settings.EMBEDDING_MODEL,
             model_kwargs={"device": device}
         )
+        # 1.1 并发会话的单条查询嵌入合并成微批前向
+        if settings.EMBED_BATCHING if batch_queries is None else batch_queries:
+            self.embeddings = BatchedEmbeddings(self.embeddings)
 
         # 2. 加载 FAISS 向量索引（已由 build_faiss.py 构建）
-        self.vector_db = FAISS.load_local(
-            folder_path=settings.VECTOR_DB_PATH,
+        self.mmap_index = mmap_index
+        self.vector_db = self._load_index(settings.VECTOR_DB_PATH)
+
+        # 2.1 科室分片与路由（分片不存在时只用全局索引）
+        self.router = None
+        self._shards = {}
+        self._shards_lock = threading.Lock()
+        if settings.USE_DEPARTMENT_SHARDS and load_manifest() is not None:
+            self.router = DepartmentRouter()
+
+        # 3. 构建 BM25（仍从 contexts.json 加载）
+        self.bm25 = self._build_bm25()
+
+    def _load_index(self, folder_path: str):
+        if self.mmap_index:
+            return self._load_mmap(folder_path)
+        return FAISS.load_local(
+            folder_path=folder_path,
             embeddings=self.embeddings,
             allow_dangerous_deserialization=True
         )
 
+    def _get_shard(self, department: str):
+        """按需加载科室分片"""
+        if department not in self._shards:
+            with self._shards_lock:
+                if department not in self._shards:
+                    self._shards[department] = self._load_index(
+                        self.router.shard_dirs[department])
+        return self._shards[department]
 
-        # 3. 构建 BM25（仍从 contexts.json 加载）
-        self.bm25 = self._build_bm25()
+    def _load_mmap(self, folder_path: str):
+        """以只读 mmap 方式加载索引，多个进程共享同一份页缓存"""
+        import faiss
+        path = Path(folder_path)
+        flags = (faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                 | getattr(faiss, "IO_FLAG_MMAP_IFC", 0))
+        try:
+            index = faiss.read_index(str(path / "index.faiss"), flags)
+        except RuntimeError:
+            # 旧版 faiss 不支持对该索引类型 mmap，退回普通加载
+            index = faiss.read_index(str(path / "index.faiss"))
+        with (path / "index.pkl").open("rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(self.embeddings, index, docstore, index_to_docstore_id)
 
     def _build_bm25(self):
-        json_path = Path(__file__).parent.parent / "data" / "contexts.json"
+        # 构建索引时做过去重则用去重后的语料，与向量索引保持一致
+        json_path = Path(settings.DEDUP_CONTEXTS_PATH)
+        if not json_path.exists():
+            json_path = Path(__file__).parent.parent / "data" / "contexts.json"
         with json_path.open("r", encoding="utf-8") as f:
             raw = json.load(f)
 
@@ -45,14 +93,169 @@ class MedicalRetrieverOffline:
         return BM25Retriever.from_documents(documents)
 
     def hybrid_retrieve(self, query: str, top_k: int = 5):
-        # 向量检索
-        faiss_docs = self.vector_db.similarity_search(query, k=top_k)
+        docs, _ = self.hybrid_retrieve_with_score(query, top_k)
+        return docs
+
+    def hybrid_retrieve_with_score(self, query: str, top_k: int = 5):
+        """同 hybrid_retrieve，另返回向量检索最佳 L2 距离（越小越相关；无结果为 None）"""
+        # 向量检索（有科室分片时先路由）
+        if self.router is None:
+            scored = self.vector_db.similarity_search_with_score(query, k=top_k)
+        else:
+            vector = self.embeddings.embed_query(query)
+            scored = self._routed_search(vector, top_k)
+        faiss_docs = [doc for doc, _ in scored]
         # BM25 检索
         bm25_docs = self.bm25.invoke(query)[:top_k]
 
         # 合并、去重
         combined = {doc.page_content: doc for doc in faiss_docs + bm25_docs}
-        return list(combined.values())
+        best_score = float(scored[0][1]) if scored else None
+        return list(combined.values()), best_score
+
+    def _routed_search(self, vector, top_k: int, departments: Optional[List[str]] = None):
+        """
+        只在路由到的科室分片中检索；路由不明确时回退全局索引。返回 (doc, L2 距离)。
+        departments 为 None 时在此路由，调用方已路由过可直接传入。
+        """
+        if departments is None:
+            departments = self.router.route(vector)
+        if not departments:
+            return self.vector_db.similarity_search_with_score_by_vector(vector, k=top_k)
+        if len(departments) == 1:
+            return self._get_shard(departments[0]).similarity_search_with_score_by_vector(vector, k=top_k)
+
+        # 多个分片：按 L2 距离合并
+        scored = []
+        for dept in departments:
+            scored += self._get_shard(dept).similarity_search_with_score_by_vector(vector, k=top_k)
+        scored.sort(key=lambda pair: pair[1])
+        return scored[:top_k]
+
+    def hybrid_retrieve_many(self, queries: List[str], top_k: int = 5):
+        """
+        批量版 hybrid_retrieve，逐条结果与单条调用一致：
+          • 所有 query 一次前向得到嵌入矩阵
+          • 一次多查询 FAISS search
+          • BM25 按词项只计算一次得分，各 query 共享
+        """
+        if not queries:
+            return []
+        faiss_docs = self._faiss_search_many(queries, top_k)
+        bm25_docs = self._bm25_search_many(queries)
+        results = []
+        for f_docs, b_docs in zip(faiss_docs, bm25_docs):
+            combined = {doc.page_content: doc for doc in f_docs + b_docs[:top_k]}
+            results.append(list(combined.values()))
+        return results
+
+    def _faiss_search_many(self, queries: List[str], top_k: int):
+        # 与 FAISS.similarity_search 的实现保持一致，只是把向量堆成矩阵
+        matrix = np.array(self.embeddings.embed_documents(queries), dtype=np.float32)
+        if self.router is None:
+            return self._faiss_search_matrix(matrix, top_k)
+
+        # 有科室分片：能路由的逐条查分片，其余仍合并成一次全局检索
+        results = [None] * len(queries)
+        unrouted = []
+        for i, vector in enumerate(matrix):
+            departments = self.router.route(vector)
+            if departments:
+                results[i] = [doc for doc, _ in
+                              self._routed_search(vector.tolist(), top_k, departments)]
+            else:
+                unrouted.append(i)
+        if unrouted:
+            for i, docs in zip(unrouted, self._faiss_search_matrix(matrix[unrouted], top_k)):
+                results[i] = docs
+        return results
+
+    def _faiss_search_matrix(self, matrix, top_k: int):
+        db = self.vector_db
+        matrix = matrix.copy()
+        if getattr(db, "_normalize_L2", False):
+            import faiss
+            faiss.normalize_L2(matrix)
+        _, indices = db.index.search(matrix, top_k)
+
+        results = []
+        for row in indices:
+            docs = []
+            for i in row:
+                if i == -1:
+                    continue
+                doc = db.docstore.search(db.index_to_docstore_id[i])
+                if not isinstance(doc, Document):
+                    raise ValueError(f"Could not find document for id {i}, got {doc}")
+                docs.append(doc)
+            results.append(docs)
+        return results
+
+    def _bm25_search_many(self, queries: List[str]):
+        # 复刻 BM25Okapi.get_scores / get_top_n 的计算顺序，结果逐位一致
+        vectorizer = self.bm25.vectorizer
+        tokenized = [self.bm25.preprocess_func(q) for q in queries]
+        doc_len = np.array(vectorizer.doc_len)
+        norm = vectorizer.k1 * (1 - vectorizer.b + vectorizer.b * doc_len / vectorizer.avgdl)
+        postings = self._bm25_postings()
+
+        term_scores = {}
+        for term in {t for tokens in tokenized for t in tokens}:
+            q_freq = np.zeros(vectorizer.corpus_size, dtype=np.int64)
+            if term in postings:
+                ids, freqs = postings[term]
+                q_freq[ids] = freqs
+            term_scores[term] = (vectorizer.idf.get(term) or 0) * (
+                q_freq * (vectorizer.k1 + 1) / (q_freq + norm))
+
+        results = []
+        for tokens in tokenized:
+            scores = np.zeros(vectorizer.corpus_size)
+            for term in tokens:
+                scores += term_scores[term]
+            top_n = np.argsort(scores)[::-1][:self.bm25.k]
+            results.append([self.bm25.docs[i] for i in top_n])
+        return results
+
+    def _bm25_postings(self):
+        """词项 -> (文档下标, 词频) 倒排表，首次批量检索时构建"""
+        if getattr(self, "_postings", None) is None:
+            postings = {}
+            for doc_id, freqs in enumerate(self.bm25.vectorizer.doc_freqs):
+                for term, freq in freqs.items():
+                    postings.setdefault(term, ([], []))
+                    postings[term][0].append(doc_id)
+                    postings[term][1].append(freq)
+            self._postings = {t: (np.array(ids), np.array(fs))
+                              for t, (ids, fs) in postings.items()}
+        return self._postings
+
+
+_offline_retriever = None
+_offline_lock = threading.Lock()
+
+
+def get_offline_retriever():
+    """
+    返回进程内共享的离线检索器（只加载一次模型与索引）。
+    配置了 RETRIEVAL_WORKERS > 0 时返回已预热的多进程检索池客户端，接口与
+    MedicalRetrieverOffline.hybrid_retrieve 相同。应用启动时调用一次即可预加载。
+    """
+    global _offline_retriever
+    if _offline_retriever is None:
+        with _offline_lock:
+            if _offline_retriever is None:
+                if settings.RETRIEVAL_WORKERS > 0:
+                    from modules.retrieval_pool import RetrievalPool
+                    pool = RetrievalPool(settings.RETRIEVAL_WORKERS)
+                    # 拉起全部工作进程并加载完模型后再对外提供
+                    pool.warmup()
+                    _offline_retriever = pool
+                else:
+                    _offline_retriever = MedicalRetrieverOffline()
+    return _offline_retriever
+
+
 class MedicalRetrieverOnline:
     def __init__(self):
         # 移除FAISS和BM25相关初始化
@@ -0,0 +1,108 @@
+# modules/stream_render.py
+
+import io
+import sys
+import time
+from typing import Iterable, Optional
+from config import settings
+from modules.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class StreamlitSink:
+    """刷新 Streamlit placeholder（markdown 只能整体替换，所以传全文）"""
+
+    def __init__(self, placeholder, cursor: str = "▌"):
+        self.placeholder = placeholder
+        self.cursor = cursor
+
+    def update(self, renderer, delta: str, final: bool):
+        self.placeholder.markdown(renderer.text + ("" if final else self.cursor))
+
+
+class TerminalSink:
+    """终端增量输出：只写新增部分"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def update(self, renderer, delta: str, final: bool):
+        if delta:
+            self.stream.write(delta)
+        if final:
+            self.stream.write("\n")
+        self.stream.flush()
+
+
+class StreamRenderer:
+    """
+    合并 token 的流式渲染：
+      • token 先进缓冲，超过时间窗或字数窗才刷新一次 sink
+      • 第一个 token 立即刷新，尽量缩短首个可见 token 时间
+      • 全文用 StringIO 增量累积，不在每个 token 上拼接整串
+    计时从创建 renderer 开始，结束时记录首 token / 首可见 token 耗时。
+    """
+
+    def __init__(self, sink, interval: Optional[float] = None, min_chars: Optional[int] = None):
+        self.sink = sink
+        self.interval = settings.STREAM_FLUSH_INTERVAL if interval is None else interval
+        self.min_chars = settings.STREAM_FLUSH_CHARS if min_chars is None else min_chars
+        self._buffer = io.StringIO()
+        self._pending = []
+        self._pending_chars = 0
+        self._text_cache = ""
+        self._dirty = False
+        self._start = time.perf_counter()
+        self._last_flush: Optional[float] = None
+        self.stats = {"tokens": 0, "updates": 0, "first_token_ms": None, "first_visible_ms": None}
+
+    @property
+    def text(self) -> str:
+        if self._dirty:
+            self._text_cache = self._buffer.getvalue()
+            self._dirty = False
+        return self._text_cache
+
+    def feed(self, token: str):
+        if not token:
+            return
+        now = time.perf_counter()
+        if self.stats["first_token_ms"] is None:
+            self.stats["first_token_ms"] = round((now - self._start) * 1000, 1)
+        self.stats["tokens"] += 1
+        self._pending.append(token)
+        self._pending_chars += len(token)
+
+        if (self._last_flush is None
+                or now - self._last_flush >= self.interval
+                or self._pending_chars >= self.min_chars):
+            self._flush(now)
+
+    def close(self) -> str:
+        """刷新剩余内容并记录统计，返回全文"""
+        now = time.perf_counter()
+        self._flush(now, final=True)
+        self.stats["total_ms"] = round((now - self._start) * 1000, 1)
+        self.stats["chars"] = len(self.text)
+        logger.info("stream_render", extra={"fields": self.stats})
+        return self.text
+
+    def render(self, tokens: Iterable[str]) -> str:
+        for token in tokens:
+            self.feed(token)
+        return self.close()
+
+    def _flush(self, now: float, final: bool = False):
+        delta = "".join(self._pending)
+        self._pending.clear()
+        self._pending_chars = 0
+        if delta:
+            self._buffer.write(delta)
+            self._dirty = True
+            if self.stats["first_visible_ms"] is None:
+                self.stats["first_visible_ms"] = round((now - self._start) * 1000, 1)
+        if delta or final:
+            self.sink.update(self, delta, final)
+            self.stats["updates"] += 1
+        self._last_flush = now
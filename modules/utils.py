@@ -1,11 +1,10 @@
-import logging
 from typing import List
 import re, json, html
 from pathlib import Path
+from modules.logging_utils import get_logger, audit
 
-# 日志配置
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# 日志配置（异步队列写出，见 modules/logging_utils.py）
+logger = get_logger(__name__)
 
 # 可维护的敏感词 txt（每行一个词），放在项目根 data/sensitive_words.txt
 SENSITIVE_TXT = Path(__file__).parent.parent / "data" / "sensitive_words.txt"
@@ -197,10 +196,11 @@ class AnswerSchema(BaseModel):
 def validate_json(text: str) -> bool:
     try:
         cleaned = clean_json_text(text)
-        logger.info("🧪 validate_json 尝试解析:\n%s", cleaned)
+        logger.debug("🧪 validate_json 尝试解析:\n%s", cleaned, extra={"payload": True})
         data = json.loads(cleaned)
         AnswerSchema.model_validate(data)
         return True
     except Exception as e:
         logger.error("❌ validate_json 失败，原因：%s", repr(e))
+        audit("validate_json_failed", error=repr(e), output=text)
         return False
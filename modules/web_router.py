@@ -0,0 +1,186 @@
+# modules/web_router.py
+
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Optional
+from config import settings
+from modules.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# 明显依赖时效信息的问题（新药、指南、政策、费用、具体医院等）必须联网
+TIME_SENSITIVE_PATTERN = re.compile(
+    r"(最新|最近发布|新药|新版|指南|共识|政策|医保|报销|价格|费用|多少钱|"
+    r"哪家医院|挂号|排名|疫情|流行|上市|批准|20\d{2}年?)"
+)
+
+
+class CircuitBreaker:
+    """
+    连续失败 / 超时 / 过慢达到阈值后熔断，冷却期内直接跳过；
+    冷却结束放行一次试探请求（半开），成功则恢复。
+    """
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release(self):
+        """放行的请求没有得出上游健康结论（例如在本地队列里超时），归还试探名额"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class WebSearchRouter:
+    """
+    按 query 决定是否需要联网检索：
+      1. 熔断器打开 -> 跳过
+      2. 时效性问题 -> 搜索
+      3. 离线检索足够相关 -> 跳过
+      4. 其余 -> 搜索（带超时，失败/过慢计入熔断器）
+    上游耗时在工作线程内计时，线程池排队时间单独记为 queue_ms。
+    排队超时（queue_timeout）只在上游卡住时计入熔断器：半开试探排队超时，
+    或正在执行的搜索已超过过慢阈值；纯本地负载造成的排队不计入。
+    每次决策以结构化字段写日志，便于统计节省的延迟与回答质量。
+    """
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.WEB_BREAKER_FAILURES,
+            cooldown=settings.WEB_BREAKER_COOLDOWN,
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.WEB_SEARCH_MAX_WORKERS,
+            thread_name_prefix="web-search",
+        )
+        # 正在执行的搜索的计时记录，用于判断排队是否由上游卡住引起
+        self._running = {}
+        self._running_lock = threading.Lock()
+
+    def _timed_call(self, timing: dict, fn, *args):
+        """在工作线程内计时，排队等待不计入上游耗时"""
+        timing["started"] = time.perf_counter()
+        with self._running_lock:
+            self._running[id(timing)] = timing
+        try:
+            return fn(*args)
+        finally:
+            timing["latency"] = time.perf_counter() - timing["started"]
+            with self._running_lock:
+                self._running.pop(id(timing), None)
+
+    def _upstream_stalled(self) -> bool:
+        """是否有正在执行的搜索已超过过慢阈值"""
+        now = time.perf_counter()
+        with self._running_lock:
+            return any(now - t["started"] >= settings.WEB_SLOW_THRESHOLD
+                       for t in self._running.values())
+
+    def decide(self, query: str, offline_score: Optional[float]) -> dict:
+        decision = {
+            "query_len": len(query),
+            "offline_score": offline_score,
+            "breaker": self.breaker.state,
+        }
+        if TIME_SENSITIVE_PATTERN.search(query):
+            decision.update(search=True, reason="time_sensitive")
+        elif offline_score is not None and offline_score <= settings.WEB_SKIP_MAX_DISTANCE:
+            decision.update(search=False, reason="local_sufficient")
+        else:
+            decision.update(search=True, reason="local_weak")
+
+        if decision["search"] and not self.breaker.allow():
+            decision.update(search=False, reason="circuit_open")
+        return decision
+
+    def search(self, online_retriever, query: str, offline_score: Optional[float],
+               top_k: int = 5) -> tuple:
+        """返回 (文档列表, 决策记录)；不联网或联网失败时文档为空"""
+        decision = self.decide(query, offline_score)
+        docs = []
+        if decision["search"]:
+            timing = {}
+            submitted = time.perf_counter()
+            future = self._executor.submit(self._timed_call, timing,
+                                           online_retriever.hybrid_retrieve, query, top_k)
+            try:
+                docs = future.result(timeout=settings.WEB_SEARCH_TIMEOUT)
+                outcome = "ok"
+            except FutureTimeout:
+                future.cancel()
+                outcome = "timeout"
+            except Exception as e:
+                outcome = f"error: {e!r}"
+
+            # 上游耗时：已完成取工作线程内的计时；仍在执行取已执行时长；未开始为 None
+            started = timing.get("started")
+            if "latency" in timing:
+                latency = timing["latency"]
+            elif started is not None:
+                latency = time.perf_counter() - started
+            else:
+                latency = None
+            queue_wait = (started if started is not None else time.perf_counter()) - submitted
+
+            if outcome == "ok" and latency <= settings.WEB_SLOW_THRESHOLD:
+                self.breaker.record_success()
+            elif outcome == "timeout" and (latency is None or latency < settings.WEB_SLOW_THRESHOLD):
+                outcome = "queue_timeout"
+                if decision["breaker"] == "half_open" or self._upstream_stalled():
+                    # 线程都被卡住的搜索占着：上游不健康，重新熔断
+                    self.breaker.record_failure()
+                else:
+                    # 纯本地负载，不能说明上游不健康
+                    self.breaker.release()
+            else:
+                self.breaker.record_failure()
+                if outcome == "ok":
+                    outcome = "slow"
+            decision.update(
+                outcome=outcome,
+                latency_ms=None if latency is None else round(latency * 1000, 1),
+                queue_ms=round(queue_wait * 1000, 1),
+            )
+
+        logger.info("web_route", extra={"fields": decision})
+        return docs, decision
+
+
+web_router = WebSearchRouter()
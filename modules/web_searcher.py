@@ -1,6 +1,15 @@
 from baidusearch.baidusearch import search
+import baidusearch.baidusearch as _baidusearch
 import re
+import functools
 from langchain.schema import Document
+from config import settings
+
+# baidusearch 的 requests 会话不带超时，挂起的请求会永久占住联网线程；
+# 给会话的每次请求补上连接 / 读取超时
+if hasattr(_baidusearch, "session"):
+    _baidusearch.session.request = functools.partial(
+        _baidusearch.session.request, timeout=settings.WEB_SEARCH_TIMEOUT)
 class BaiduSearcher:
     @staticmethod
     def _get_fallback_knowledge(self, query):
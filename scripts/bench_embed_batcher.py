@@ -0,0 +1,64 @@
+# scripts/bench_embed_batcher.py
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# 加载 config
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+import torch
+from langchain_huggingface import HuggingFaceEmbeddings
+from config import settings
+from modules.embed_batcher import BatchedEmbeddings
+from scripts.load_test import SAMPLE_QUERIES, percentile
+
+
+def run(embed_query, sessions: int, per_session: int):
+    def session(i):
+        latencies = []
+        for j in range(per_session):
+            query = SAMPLE_QUERIES[(i + j) % len(SAMPLE_QUERIES)] + f"（会话 {i}）"
+            start = time.perf_counter()
+            embed_query(query)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        latencies = [v for vs in pool.map(session, range(sessions)) for v in vs]
+    wall = time.perf_counter() - start
+    return {
+        "qps": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询嵌入微批调度吞吐基准")
+    parser.add_argument("-s", "--sessions", type=int, default=16, help="并发会话数")
+    parser.add_argument("-n", "--per-session", type=int, default=20, help="每个会话的查询数")
+    parser.add_argument("--max-batch", type=int, default=settings.EMBED_BATCH_MAX_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.EMBED_BATCH_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    base = HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL, model_kwargs={"device": device})
+    batched = BatchedEmbeddings(base, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    base.embed_query("预热")
+    batched.embed_query("预热")
+
+    direct = run(base.embed_query, args.sessions, args.per_session)
+    batched.batcher._reset_stats()
+    micro = run(batched.embed_query, args.sessions, args.per_session)
+    print(f"逐条前向：{direct}")
+    print(f"微批调度：{micro}  批统计：{batched.batcher.stats()}")
+    print(f"吞吐提升 {micro['qps'] / direct['qps']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# scripts/bench_retrieve_many.py
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+# 加载 config
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+from modules.retriever import MedicalRetrieverOffline
+
+
+def load_queries(n: int, seed: int = 0):
+    """从 contexts.json 随机抽取 n 条提问作为测试 query"""
+    path = project_root / "data" / "contexts.json"
+    raw = json.loads(path.read_text(encoding="utf-8"))
+    asks = [str(item.get("ask", "")).strip() for item in raw["contexts"]]
+    asks = [a for a in asks if a]
+    random.Random(seed).shuffle(asks)
+    return asks[:n]
+
+
+def bench(num_queries: int, top_k: int, batch_size: int):
+    print("加载检索器 ...")
+    retriever = MedicalRetrieverOffline()
+    queries = load_queries(num_queries)
+    print(f"共 {len(queries)} 条 query，top_k={top_k}，batch_size={batch_size}")
+
+    # 预热：模型首次前向与 BM25 倒排表构建不计入耗时
+    retriever.hybrid_retrieve(queries[0], top_k=top_k)
+    retriever.hybrid_retrieve_many(queries[:2], top_k=top_k)
+
+    t0 = time.perf_counter()
+    single = [retriever.hybrid_retrieve(q, top_k=top_k) for q in queries]
+    t_single = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    many = []
+    for i in range(0, len(queries), batch_size):
+        many.extend(retriever.hybrid_retrieve_many(queries[i:i + batch_size], top_k=top_k))
+    t_many = time.perf_counter() - t0
+
+    mismatched = sum(
+        [d.page_content for d in a] != [d.page_content for d in b]
+        for a, b in zip(single, many)
+    )
+    print(f"逐条 hybrid_retrieve     : {t_single:.2f}s  {len(queries) / t_single:.1f} q/s")
+    print(f"批量 hybrid_retrieve_many: {t_many:.2f}s  {len(queries) / t_many:.1f} q/s")
+    print(f"加速比 {t_single / t_many:.2f}x，结果不一致 {mismatched}/{len(queries)} 条")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量检索吞吐基准")
+    parser.add_argument("-n", "--num-queries", type=int, default=256)
+    parser.add_argument("-k", "--top-k", type=int, default=5)
+    parser.add_argument("-b", "--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    bench(args.num_queries, args.top_k, args.batch_size)
@@ -0,0 +1,94 @@
+# scripts/bench_router.py
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# 加载 config
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+from scripts.mock_servers import MockLLMServer
+from scripts.load_test import percentile
+
+MESSAGES = [
+    {"role": "system", "content": "你是一名医疗助理"},
+    {"role": "user", "content": "最近持续低烧，咳嗽加重，有必要就医吗？"},
+]
+
+
+def run(router, requests: int, concurrency: int):
+    def one(_):
+        start = time.perf_counter()
+        try:
+            router.complete(MESSAGES)
+            return time.perf_counter() - start
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    ok = [v for v in latencies if v is not None]
+    ms = lambda v: None if v is None else round(v * 1000, 1)
+    return {
+        "ok": len(ok),
+        "errors": len(latencies) - len(ok),
+        "p50_ms": ms(percentile(ok, 50)),
+        "p95_ms": ms(percentile(ok, 95)),
+        "p99_ms": ms(percentile(ok, 99)),
+        "hedges_fired": router.hedges_fired,
+        "hedges_won": router.hedges_won,
+        "failovers": router.failovers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比对冲请求开/关时的尾延迟（本地模拟端点）")
+    parser.add_argument("-n", "--requests", type=int, default=300)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--tps", type=float, default=400.0)
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="主端点长尾请求比例")
+    parser.add_argument("--slow-delay", type=float, default=3.0, help="长尾请求额外延迟（秒）")
+    parser.add_argument("--hedge-percentile", type=float, default=90)
+    args = parser.parse_args()
+
+    primary = MockLLMServer(ttft=args.ttft, tokens_per_sec=args.tps, slow_rate=args.slow_rate,
+                            slow_delay=args.slow_delay, name="primary").start()
+    backup = MockLLMServer(ttft=args.ttft, tokens_per_sec=args.tps, slow_rate=args.slow_rate,
+                           slow_delay=args.slow_delay, name="backup").start()
+    os.environ.setdefault("DEEPSEEK_API_KEY", "mock-key")
+
+    import logging
+    from config import settings
+    from modules.model_router import ModelRouter
+    for name in ("modules.model_router", None):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    # 模拟端点延迟很短，放宽对冲等待下限与样本数要求
+    settings.HEDGE_MIN_DELAY = 0.05
+    settings.HEDGE_MIN_SAMPLES = 10
+    settings.HEDGE_PERCENTILE = args.hedge_percentile
+
+    endpoints = [
+        {"name": "primary", "model": settings.DEFAULT_MODEL, "base_url": primary.url, "api_key": "mock"},
+        {"name": "backup", "model": settings.DEFAULT_MODEL, "base_url": backup.url, "api_key": "mock"},
+    ]
+    for hedging in (False, True):
+        router = ModelRouter(endpoints=endpoints, hedging=hedging)
+        # 预热：积累延迟样本
+        run(router, settings.HEDGE_MIN_SAMPLES * 2, args.concurrency)
+        router.hedges_fired = router.hedges_won = router.failovers = 0
+        disconnects = primary.disconnects + backup.disconnects
+        result = run(router, args.requests, args.concurrency)
+        result["cancelled_losers"] = primary.disconnects + backup.disconnects - disconnects
+        print(f"对冲{'开' if hedging else '关'}：{result}")
+
+    primary.stop()
+    backup.stop()
+
+
+if __name__ == "__main__":
+    main()
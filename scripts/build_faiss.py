@@ -3,6 +3,11 @@
 import sys
 from pathlib import Path
 import json
+import time
+import shutil
+import argparse
+from collections import defaultdict
+import numpy as np
 from tqdm import tqdm
 import torch
 
@@ -15,8 +20,62 @@ project_root = Path(__file__).parent.parent.resolve()
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 from config import settings
+from modules.department_router import MANIFEST_FILE, CENTROIDS_FILE, UNSHARDED
+from scripts.dedup_corpus import dedup_records
 
-def build_index():
+
+def build_department_shards(texts, vectors, metadatas, embeddings):
+    """
+    按 department 元数据切分出科室子索引，并为路由器计算科室质心。
+    文档数不足 SHARD_MIN_DOCS 的科室和无科室文档不建分片，但同样计算质心，
+    query 最接近它们时路由器回退全局索引。复用已生成的向量，不重复嵌入。
+    """
+    groups = defaultdict(list)
+    for i, meta in enumerate(metadatas):
+        groups[meta.get("department") or UNSHARDED].append(i)
+
+    shard_root = Path(settings.SHARD_DB_PATH)
+    if shard_root.exists():
+        shutil.rmtree(shard_root)
+    shard_root.mkdir(parents=True)
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+    manifest, centroids, centroid_names = [], [], []
+    for dept, ids in tqdm(sorted(groups.items(), key=lambda kv: -len(kv[1])), desc="构建科室分片"):
+        centroid = matrix[ids].mean(axis=0)
+        centroids.append(centroid / max(np.linalg.norm(centroid), 1e-12))
+        centroid_names.append(dept)
+        if dept == UNSHARDED or len(ids) < settings.SHARD_MIN_DOCS:
+            continue
+        shard_dir = f"{len(manifest):03d}"
+        shard_db = FAISS.from_embeddings(
+            [(texts[i], vectors[i]) for i in ids],
+            embedding=embeddings,
+            metadatas=[metadatas[i] for i in ids]
+        )
+        shard_db.save_local(str(shard_root / shard_dir))
+        manifest.append({"name": dept, "dir": shard_dir, "size": len(ids)})
+
+    if not manifest:
+        # 没有科室达到 SHARD_MIN_DOCS：不写清单，检索时只用全局索引
+        shutil.rmtree(shard_root)
+        print(f"    没有科室达到 {settings.SHARD_MIN_DOCS} 条，跳过分片，只使用全局索引")
+        return
+
+    np.save(shard_root / CENTROIDS_FILE, np.asarray(centroids, dtype=np.float32))
+    (shard_root / MANIFEST_FILE).write_text(
+        json.dumps({"departments": manifest, "centroids": centroid_names},
+                   ensure_ascii=False, indent=2),
+        encoding="utf-8"
+    )
+    covered = sum(d["size"] for d in manifest)
+    print(f"    共 {len(manifest)} 个科室分片，覆盖 {covered}/{len(texts)} 条知识；"
+          f"其余 {len(texts) - covered} 条只在全局索引中（路由到其质心时回退全局索引）")
+
+def build_index(dedup: bool = settings.DEDUP_ENABLED):
+    build_start = time.perf_counter()
     # 0. 检查 GPU
     if torch.cuda.is_available():
         print(f"✅ 检测到 GPU：{torch.cuda.get_device_name(0)}，将用于嵌入计算")
@@ -26,24 +85,46 @@ def build_index():
         device = "cpu"
 
     # 1. 读取 contexts.json
-    print("[1/4] 加载 contexts.json ...")
+    print("[1/5] 加载 contexts.json ...")
     path = Path(project_root) / "data" / "contexts.json"
     raw = json.loads(path.read_text(encoding="utf-8"))
     print(f"    共载入 {len(raw['contexts'])} 条知识")
 
+    # 1.1 近重复去重（去重后的语料另存一份，供 BM25 使用）
+    contexts = raw["contexts"]
+    dedup_stats = None
+    dedup_path = Path(settings.DEDUP_CONTEXTS_PATH)
+    if dedup:
+        t0 = time.perf_counter()
+        contexts, dedup_stats = dedup_records(contexts)
+        dedup_path.write_text(
+            json.dumps({"contexts": contexts}, ensure_ascii=False, indent=2),
+            encoding="utf-8"
+        )
+        print(f"    近重复去重：{dedup_stats['before']} → {dedup_stats['after']} 条"
+              f"（减少 {dedup_stats['removed'] / max(dedup_stats['before'], 1):.1%}，"
+              f"耗时 {time.perf_counter() - t0:.1f}s）")
+    elif dedup_path.exists():
+        # 不去重时删掉旧的去重语料，避免 BM25 与向量索引不一致
+        dedup_path.unlink()
+
     # 2. 构造 Document 对象
-    print("[2/4] 构造 Document 对象 ...")
+    print("[2/5] 构造 Document 对象 ...")
     documents = []
-    for item in tqdm(raw["contexts"], desc="处理条目"):
+    for item in tqdm(contexts, desc="处理条目"):
         content = f"示例问：{item.get('ask','').strip()}\n示例答：{item.get('answer','').strip()}"
         meta = {
             "department": item.get("department", "").strip(),
             "title": item.get("title", "").strip()
         }
+        # 簇信息只出现在有重复的代表记录上
+        for key in ("dup_cluster", "dup_count", "dup_members", "dup_departments"):
+            if key in item:
+                meta[key] = item[key]
         documents.append(Document(page_content=content, metadata=meta))
 
     # 3. 嵌入并构建索引
-    print("[3/4] 生成文本嵌入并构建 FAISS 向量索引 ...")
+    print("[3/5] 生成文本嵌入并构建 FAISS 向量索引 ...")
     embeddings = HuggingFaceEmbeddings(
         model_name=settings.EMBEDDING_MODEL,
         model_kwargs={"device": device}
@@ -53,11 +134,13 @@ def build_index():
     metadatas = [doc.metadata for doc in documents]
     vectors = []
 
+    embed_start = time.perf_counter()
     batch_size = 512
     for i in tqdm(range(0, len(texts), batch_size), desc="生成嵌入"):
         batch = texts[i:i + batch_size]
         vec = embeddings.embed_documents(batch)
         vectors.extend(vec)
+    embed_time = time.perf_counter() - embed_start
 
     # ✅ 核心：将 texts 和 vectors 配对
     text_embeddings = list(zip(texts, vectors))
@@ -71,9 +154,24 @@ def build_index():
 
 
     # 4. 保存到本地
-    print(f"[4/4] 保存索引到：{settings.VECTOR_DB_PATH}")
+    print(f"[4/5] 保存索引到：{settings.VECTOR_DB_PATH}")
     vector_db.save_local(settings.VECTOR_DB_PATH)
+
+    # 5. 科室分片 + 路由质心
+    print(f"[5/5] 构建科室分片到：{settings.SHARD_DB_PATH}")
+    build_department_shards(texts, vectors, metadatas, embeddings)
     print("✅ FAISS 索引构建完成！")
 
+    # 构建耗时与索引体积报告；去重节省量按每条的平均成本线性估算
+    index_mb = (Path(settings.VECTOR_DB_PATH) / "index.faiss").stat().st_size / 2**20
+    total_time = time.perf_counter() - build_start
+    print(f"    总耗时 {total_time:.1f}s（嵌入 {embed_time:.1f}s），索引 {index_mb:.1f} MB")
+    if dedup_stats and dedup_stats["after"]:
+        ratio = dedup_stats["removed"] / dedup_stats["after"]
+        print(f"    去重约节省嵌入 {embed_time * ratio:.1f}s、索引 {index_mb * ratio:.1f} MB")
+
 if __name__ == "__main__":
-    build_index()
+    parser = argparse.ArgumentParser(description="构建 FAISS 索引与科室分片")
+    parser.add_argument("--no-dedup", action="store_true", help="跳过近重复去重")
+    args = parser.parse_args()
+    build_index(dedup=not args.no_dedup)
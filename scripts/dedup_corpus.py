@@ -0,0 +1,160 @@
+# scripts/dedup_corpus.py
+
+import re
+import sys
+import json
+import zlib
+from pathlib import Path
+from collections import Counter
+import numpy as np
+
+# 加载 config
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+from config import settings
+
+# 哈希取模用的梅森素数 2^31-1：a*x+b 在 int64 内不会溢出
+_PRIME = (1 << 31) - 1
+
+# 去掉空白与常见标点后再切 shingle，避免格式差异影响相似度
+_NOISE = re.compile(r"[\s，。！？、；：“”‘’（）《》,.!?;:'\"()\[\]【】…—\-]+")
+
+
+def record_text(item: dict) -> str:
+    return f"{str(item.get('ask', '')).strip()}\n{str(item.get('answer', '')).strip()}"
+
+
+def shingles(text: str, k: int) -> set:
+    """字符级 k-shingle 集合"""
+    text = _NOISE.sub("", text.lower())
+    if len(text) <= k:
+        return {text}
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def minhash_signatures(texts, num_perm: int, k: int, seed: int = 1) -> np.ndarray:
+    """每条文本一行 MinHash 签名，形状 (len(texts), num_perm)"""
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, _PRIME, size=num_perm, dtype=np.int64)
+    b = rng.randint(0, _PRIME, size=num_perm, dtype=np.int64)
+
+    signatures = np.empty((len(texts), num_perm), dtype=np.int64)
+    for row, text in enumerate(texts):
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) & _PRIME for s in shingles(text, k)),
+            dtype=np.int64,
+        )
+        signatures[row] = ((np.outer(hashes, a) + b) % _PRIME).min(axis=0)
+    return signatures
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, x: int, y: int):
+        rx, ry = self.find(x), self.find(y)
+        if rx != ry:
+            self.parent[max(rx, ry)] = min(rx, ry)
+
+
+def cluster_near_duplicates(signatures: np.ndarray, bands: int, threshold: float):
+    """
+    LSH 分桶：签名切成 bands 段，任意一段完全相同即为候选；
+    候选再用签名估计的 Jaccard 相似度过滤，通过的并入同一簇。
+    """
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    uf = _UnionFind(n)
+    for band in range(bands):
+        buckets = {}
+        chunk = signatures[:, band * rows:(band + 1) * rows]
+        for i in range(n):
+            buckets.setdefault(chunk[i].tobytes(), []).append(i)
+        for members in buckets.values():
+            # 只与桶内第一条比较，避免大桶两两比较的平方开销
+            leader = members[0]
+            for other in members[1:]:
+                if uf.find(other) == uf.find(leader):
+                    continue
+                if np.mean(signatures[leader] == signatures[other]) >= threshold:
+                    uf.union(leader, other)
+
+    clusters = {}
+    for i in range(n):
+        clusters.setdefault(uf.find(i), []).append(i)
+    return list(clusters.values())
+
+
+def _department(item: dict) -> str:
+    return str(item.get("department", "")).strip()
+
+
+def pick_canonical(records, members) -> int:
+    """
+    在簇内记录最多的科室中选回答最长的一条作代表，
+    避免代表记录被换到别的科室分片（票数相同时取含最长回答的科室）
+    """
+    answer_len = lambda i: (len(str(records[i].get("answer", ""))), -i)
+    votes = Counter(_department(records[i]) for i in members)
+    top = max(votes.values())
+    return max((i for i in members if votes[_department(records[i])] == top), key=answer_len)
+
+
+def dedup_records(records, threshold=None, num_perm=None, bands=None, k=None):
+    """
+    对 ask/answer 记录做近重复去重，每簇保留一条代表（见 pick_canonical）。
+    只有真正存在重复的簇才在代表记录上写入簇信息，单条记录保持原样：
+      dup_cluster    ：簇编号
+      dup_count      ：簇内记录数
+      dup_members    ：簇内全部记录在原始列表中的下标
+      dup_departments：簇跨多个科室时，簇内出现的全部科室
+    返回 (去重后的记录, 统计信息)
+    """
+    threshold = threshold or settings.DEDUP_THRESHOLD
+    num_perm = num_perm or settings.DEDUP_NUM_PERM
+    bands = bands or settings.DEDUP_BANDS
+    k = k or settings.DEDUP_SHINGLE_SIZE
+
+    signatures = minhash_signatures([record_text(r) for r in records], num_perm, k)
+    clusters = cluster_near_duplicates(signatures, bands, threshold)
+
+    kept = []
+    for cluster_id, members in enumerate(sorted(clusters, key=lambda m: m[0])):
+        if len(members) == 1:
+            kept.append(records[members[0]])
+            continue
+        item = dict(records[pick_canonical(records, members)])
+        item["dup_cluster"] = cluster_id
+        item["dup_count"] = len(members)
+        item["dup_members"] = members
+        departments = sorted({_department(records[i]) for i in members} - {""})
+        if len(departments) > 1:
+            item["dup_departments"] = departments
+        kept.append(item)
+
+    stats = {
+        "before": len(records),
+        "after": len(kept),
+        "removed": len(records) - len(kept),
+        "clusters_with_dups": sum(1 for m in clusters if len(m) > 1),
+        "cross_department_clusters": sum(1 for r in kept if "dup_departments" in r),
+    }
+    return kept, stats
+
+
+if __name__ == "__main__":
+    # 单独运行：只统计去重效果，不改动任何文件
+    path = project_root / "data" / "contexts.json"
+    raw = json.loads(path.read_text(encoding="utf-8"))
+    _, stats = dedup_records(raw["contexts"])
+    print(f"去重前 {stats['before']} 条，去重后 {stats['after']} 条，"
+          f"减少 {stats['removed'] / max(stats['before'], 1):.1%}"
+          f"（{stats['clusters_with_dups']} 个重复簇）")
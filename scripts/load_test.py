@@ -0,0 +1,220 @@
+# scripts/load_test.py
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# 加载 config
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+from scripts.mock_servers import MockLLMServer, FakeBaiduBackend
+
+SAMPLE_QUERIES = [
+    "最近持续低烧，咳嗽加重，有必要就医吗？",
+    "经常头晕，感到乏力怎么办",
+    "糖尿病在饮食方面的注意事项有哪些",
+    "孩子发烧39度，精神还可以，需要马上去医院吗",
+    "胃胀反酸好几天了，吃什么药比较好",
+    "高血压患者可以喝咖啡吗",
+    "膝盖上下楼梯疼，是不是关节炎",
+    "晚上总是失眠多梦，白天没精神",
+]
+
+
+class FakeOfflineRetriever:
+    """不加载模型与索引的离线检索替身，用于只压测 LLM/联网链路"""
+
+    def __init__(self, score, latency: float = 0.0):
+        from langchain.schema import Document
+        self.score = score
+        self.latency = latency
+        self.docs = [Document(page_content=f"示例问：示例问题 {i}\n示例答：示例回答 {i}",
+                              metadata={"department": "内科", "title": f"示例 {i}"})
+                     for i in range(5)]
+
+    def hybrid_retrieve_with_score(self, query, top_k=5):
+        time.sleep(self.latency)
+        return self.docs[:top_k], self.score
+
+    def hybrid_retrieve(self, query, top_k=5):
+        return self.hybrid_retrieve_with_score(query, top_k)[0]
+
+
+class ResourceSampler:
+    """后台采样峰值线程数与常驻内存（Linux 读 /proc/self/statm）"""
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_rss_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        page_mb = os.sysconf("SC_PAGE_SIZE") / 2**20 if hasattr(os, "sysconf") else 0
+        while not self._stop.is_set():
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            try:
+                with open("/proc/self/statm") as f:
+                    rss = int(f.read().split()[1]) * page_mb
+                self.peak_rss_mb = max(self.peak_rss_mb, rss)
+            except OSError:
+                pass
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentile(values, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def run_user(generator, mode: str, requests_per_user: int, results: list, lock):
+    from modules.history import DialogueHistory
+    dialogue = DialogueHistory()
+    for _ in range(requests_per_user):
+        query = random.choice(SAMPLE_QUERIES)
+        start = time.perf_counter()
+        first_token = None
+        ok = True
+        try:
+            if mode == "stream":
+                chunks = []
+                for tok in generator.stream_natural_reply(query=query,
+                                                          dialogue_history=dialogue.as_messages()):
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    chunks.append(tok)
+                reply = "".join(chunks)
+                ok = bool(reply)
+            else:
+                reply = generator.generate_answer(query=query,
+                                                  dialogue_history=dialogue.as_messages())
+                # generate_answer 出错时返回兜底 JSON 而不是抛异常
+                ok = json.loads(reply).get("answer") != "抱歉，我暂时无法提供有效建议。"
+            dialogue.add_turn(query, reply)
+        except Exception:
+            ok = False
+        latency = time.perf_counter() - start
+        with lock:
+            results.append({"ok": ok, "latency": latency, "ttft": first_token})
+
+
+def run_level(generator, concurrency: int, mode: str, requests_per_user: int):
+    results, lock = [], threading.Lock()
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    with ResourceSampler() as sampler:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(concurrency):
+                pool.submit(run_user, generator, mode, requests_per_user, results, lock)
+    wall = time.perf_counter() - start
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = ((usage_after.ru_utime - usage_before.ru_utime)
+           + (usage_after.ru_stime - usage_before.ru_stime))
+
+    latencies = [r["latency"] for r in results if r["ok"]]
+    ttfts = [r["ttft"] for r in results if r["ok"] and r["ttft"] is not None]
+    ms = lambda v: None if v is None else round(v * 1000, 1)
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "ok": len(latencies),
+        "errors": len(results) - len(latencies),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p90_ms": ms(percentile(latencies, 90)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "ttft_p50_ms": ms(percentile(ttfts, 50)),
+        "cpu_pct": round(100 * cpu / wall, 1),
+        "peak_rss_mb": round(sampler.peak_rss_mb, 1),
+        "peak_threads": sampler.peak_threads,
+    }
+
+
+def print_table(rows):
+    cols = ["concurrency", "requests", "ok", "errors", "throughput_rps", "p50_ms",
+            "p90_ms", "p99_ms", "ttft_p50_ms", "cpu_pct", "peak_rss_mb", "peak_threads"]
+    print("  ".join(f"{c:>14}" for c in cols))
+    for row in rows:
+        print("  ".join(f"{str(row[c]):>14}" for c in cols))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端压测：本地模拟 LLM 与百度搜索")
+    parser.add_argument("--concurrency", default="1,4,16,32", help="逐级并发用户数，逗号分隔")
+    parser.add_argument("--requests-per-user", type=int, default=3)
+    parser.add_argument("--mode", choices=["answer", "stream"], default="answer",
+                        help="answer 调用 generate_answer，stream 调用 stream_natural_reply")
+    parser.add_argument("--ttft", type=float, default=0.5, help="模拟 LLM 首 token 延迟（秒）")
+    parser.add_argument("--tps", type=float, default=50.0, help="模拟 LLM 每秒输出 token 数")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--search-error-rate", type=float, default=0.0)
+    parser.add_argument("--fake-offline", action="store_true",
+                        help="不加载嵌入模型与 FAISS 索引，用替身代替离线检索")
+    parser.add_argument("--offline-score", type=float, default=None,
+                        help="替身离线检索返回的距离（影响是否联网）")
+    parser.add_argument("--json", help="把结果另存为 JSON 文件")
+    parser.add_argument("--verbose", action="store_true", help="保留 INFO 日志")
+    args = parser.parse_args()
+
+    # 先起模拟服务，再让 config 读到指向它的环境变量
+    llm = MockLLMServer(ttft=args.ttft, tokens_per_sec=args.tps,
+                        error_rate=args.llm_error_rate).start()
+    os.environ["DEEPSEEK_BASE_URL"] = llm.url
+    os.environ.setdefault("DEEPSEEK_API_KEY", "mock-key")
+    # .env 中的备用端点会让对冲请求打到真实服务商；置空（而非删除）以免 load_dotenv 重新填上
+    os.environ["BACKUP_BASE_URL"] = ""
+
+    import logging
+    from config import settings
+    # 模拟回答不写入真实审计日志（须在导入任何 modules 之前关闭）
+    settings.AUDIT_ENABLED = False
+    import modules.retriever as retriever
+    from modules.generator import DeepSeekGenerator
+    if not args.verbose:
+        for name in settings.LOG_LEVELS:
+            logging.getLogger(None if name == "root" else name).setLevel(logging.WARNING)
+    baidu = FakeBaiduBackend(latency=args.search_latency,
+                             error_rate=args.search_error_rate).install()
+    if args.fake_offline:
+        retriever._offline_retriever = FakeOfflineRetriever(args.offline_score)
+    else:
+        print("加载离线检索器 ...")
+        retriever.get_offline_retriever()
+
+    print(f"模拟 LLM：{llm.url}  ttft={args.ttft}s  {args.tps} tok/s  错误率 {args.llm_error_rate}")
+    rows = []
+    for level in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+        rows.append(run_level(DeepSeekGenerator(), level, args.mode, args.requests_per_user))
+        print_table(rows[-1:] if len(rows) > 1 else rows)
+    print("\n汇总：")
+    print_table(rows)
+    print(f"LLM 请求 {llm.requests} 次，百度搜索 {baidu.calls} 次")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+    llm.stop()
+
+
+if __name__ == "__main__":
+    main()
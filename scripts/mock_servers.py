@@ -0,0 +1,208 @@
+# scripts/mock_servers.py
+
+import json
+import time
+import random
+import select
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 结构化回答样例：满足 AnswerSchema，generate_answer 校验可通过
+MOCK_JSON_REPLY = json.dumps({
+    "direct_reply": "根据您的描述，可能是普通感冒引起的症状。",
+    "answer": "低热伴咳嗽多见于上呼吸道感染，一般一周左右可自愈。",
+    "suggestion": "多饮水;注意休息;体温超过 38.5℃ 可服用退热药",
+    "risk_level": "低",
+    "confidence": 0.8,
+    "consult_urgency": "观察即可",
+    "possible_causes": [
+        {"name": "上呼吸道感染", "reason": "低热+咳嗽", "test": "血常规"},
+        {"name": "急性支气管炎", "reason": "咳嗽加重", "test": "胸片"}
+    ],
+    "recommended_department": "呼吸内科"
+}, ensure_ascii=False)
+
+# 自然语言回答样例
+MOCK_TEXT_REPLY = (
+    "根据您描述的症状，最常见的原因是上呼吸道感染。建议多喝水、注意休息，"
+    "如果体温持续超过 38.5℃ 或出现呼吸困难，请尽快到呼吸内科就诊。"
+)
+
+
+def _split_tokens(text: str, chars_per_token: int = 2):
+    return [text[i:i + chars_per_token] for i in range(0, len(text), chars_per_token)]
+
+
+class MockLLMServer:
+    """
+    本地 OpenAI 兼容接口（/v1/chat/completions），可配置：
+      ttft           首 token 延迟（秒）
+      tokens_per_sec 输出速度
+      error_rate     返回 500 的概率
+      slow_rate      额外卡顿 slow_delay 秒的概率（模拟长尾）
+    支持 stream=True 的 SSE 流式输出。system 提示中要求 JSON 时返回结构化回答。
+    """
+
+    def __init__(self, ttft: float = 0.5, tokens_per_sec: float = 50.0,
+                 error_rate: float = 0.0, slow_rate: float = 0.0, slow_delay: float = 5.0,
+                 host: str = "127.0.0.1", port: int = 0, name: str = "mock"):
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.name = name
+        self.requests = 0
+        self.disconnects = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                if not self.path.rstrip("/").endswith("chat/completions"):
+                    return self._send_json(404, {"error": {"message": "not found"}})
+                if random.random() < server.error_rate:
+                    return self._send_json(500, {"error": {"message": "mock upstream error"}})
+
+                messages = body.get("messages", [])
+                system = " ".join(str(m.get("content", "")) for m in messages
+                                  if m.get("role") == "system")
+                wants_json = "JSON" in system and "自然语言" not in system
+                tokens = _split_tokens(MOCK_JSON_REPLY if wants_json else MOCK_TEXT_REPLY)
+                model = body.get("model", server.name)
+
+                delay = server.ttft
+                if random.random() < server.slow_rate:
+                    delay += server.slow_delay
+                if self._client_gone(delay):
+                    # 首 token 前客户端已断开（例如对冲请求被取消）
+                    with server._lock:
+                        server.disconnects += 1
+                    self.close_connection = True
+                    return
+                if body.get("stream"):
+                    self._stream(tokens, model)
+                else:
+                    time.sleep(len(tokens) / server.tokens_per_sec)
+                    self._send_json(200, {
+                        "id": "mock-completion",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "".join(tokens)},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens),
+                                  "total_tokens": len(tokens)},
+                    })
+
+            def _client_gone(self, delay: float) -> bool:
+                """等待 delay 秒，期间客户端关闭连接则提前返回 True"""
+                deadline = time.monotonic() + delay
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    readable, _, _ = select.select([self.connection], [], [], remaining)
+                    if not readable:
+                        return False
+                    try:
+                        if not self.connection.recv(1, socket.MSG_PEEK):
+                            return True
+                    except OSError:
+                        return True
+                    # 有数据可读（客户端流水线发送了下一个请求），继续等待
+                    time.sleep(min(remaining, 0.01))
+
+            def _stream(self, tokens, model):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                delay = 1.0 / server.tokens_per_sec
+                try:
+                    for tok in tokens:
+                        chunk = {
+                            "id": "mock-completion",
+                            "object": "chat.completion.chunk",
+                            "created": int(time.time()),
+                            "model": model,
+                            "choices": [{"index": 0, "delta": {"content": tok}, "finish_reason": None}],
+                        }
+                        self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                        time.sleep(delay)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # 客户端主动断开（例如对冲请求被取消）
+                    with server._lock:
+                        server.disconnects += 1
+                self.close_connection = True
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+class FakeBaiduBackend:
+    """替换 baidusearch.search 的假后端，可配置延迟与失败率"""
+
+    def __init__(self, latency: float = 0.3, error_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+
+    def search(self, query, num_results=3):
+        self.calls += 1
+        time.sleep(self.latency)
+        if random.random() < self.error_rate:
+            raise ConnectionError("mock baidu search failure")
+        return [{
+            "title": f"{query} - 示例网页 {i}",
+            "abstract": f"关于{query}的常见原因、检查与治疗建议（模拟搜索结果 {i}）。",
+            "url": f"https://example.com/{i}",
+        } for i in range(num_results)]
+
+    def install(self):
+        """把 modules.web_searcher 中的 search 替换为本假后端"""
+        import modules.web_searcher as web_searcher
+        web_searcher.search = self.search
+        return self
@@ -0,0 +1,18 @@
+# tests/conftest.py
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# 测试从项目根目录导入 config / modules / scripts
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+# modules.model_router 导入时即创建 OpenAI 客户端，需要一个非空 key
+os.environ.setdefault("DEEPSEEK_API_KEY", "test-key")
+
+# 审计日志写到临时目录，测试不在 data/logs 下留下文件
+from config import settings
+settings.AUDIT_LOG_PATH = str(Path(tempfile.mkdtemp(prefix="audit-")) / "audit.jsonl")
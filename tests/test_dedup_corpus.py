@@ -0,0 +1,50 @@
+# tests/test_dedup_corpus.py
+
+from scripts.dedup_corpus import dedup_records
+
+ASK = "最近持续低烧，咳嗽加重，晚上咳得睡不着觉，有必要去医院就医吗"
+ANSWER = "低热伴咳嗽多见于上呼吸道感染，一般一周左右可自愈，注意多饮水和休息。"
+
+
+def record(ask, answer, department):
+    return {"ask": ask, "answer": answer, "department": department, "title": ask[:8]}
+
+
+def test_singletons_are_kept_unchanged():
+    records = [
+        record("糖尿病在饮食方面的注意事项有哪些", "控制总热量，少吃精制糖。", "内分泌科"),
+        record("膝盖上下楼梯疼是不是关节炎", "可能是髌骨软化或骨关节炎。", "骨科"),
+    ]
+    kept, stats = dedup_records(records)
+    assert kept == records
+    assert stats["removed"] == 0
+
+
+def test_near_duplicates_collapse_into_one_record():
+    records = [
+        record(ASK, ANSWER, "内科"),
+        record(ASK + "？", ANSWER + "！", "内科"),
+        record("高血压患者可以喝咖啡吗", "适量饮用一般没有问题。", "心内科"),
+    ]
+    kept, stats = dedup_records(records)
+    assert stats == {"before": 3, "after": 2, "removed": 1,
+                     "clusters_with_dups": 1, "cross_department_clusters": 0}
+    merged = next(r for r in kept if "dup_cluster" in r)
+    assert merged["dup_count"] == 2 and merged["dup_members"] == [0, 1]
+    assert "dup_departments" not in merged
+    assert "dup_cluster" not in next(r for r in kept if r["department"] == "心内科")
+
+
+def test_canonical_stays_in_majority_department():
+    records = [
+        record(ASK, ANSWER, "内科"),
+        record(ASK, ANSWER + "。", "内科"),
+        # 回答最长，但所在科室只占少数
+        record(ASK, ANSWER + "如症状加重请及时就诊。", "儿科"),
+    ]
+    kept, stats = dedup_records(records)
+    assert len(kept) == 1
+    assert kept[0]["department"] == "内科"
+    assert kept[0]["answer"] == ANSWER + "。"
+    assert kept[0]["dup_departments"] == ["儿科", "内科"]
+    assert stats["cross_department_clusters"] == 1
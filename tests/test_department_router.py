@@ -0,0 +1,51 @@
+# tests/test_department_router.py
+
+import json
+import numpy as np
+from modules.department_router import (
+    DepartmentRouter, MANIFEST_FILE, CENTROIDS_FILE, UNSHARDED)
+
+
+def write_shards(path, departments, centroids, centroid_names=None):
+    manifest = {"departments": [{"name": name, "dir": f"{i:03d}", "size": 1}
+                                for i, name in enumerate(departments)]}
+    if centroid_names is not None:
+        manifest["centroids"] = centroid_names
+    (path / MANIFEST_FILE).write_text(json.dumps(manifest), encoding="utf-8")
+    np.save(path / CENTROIDS_FILE, np.asarray(centroids, dtype=np.float32))
+
+
+def test_route_picks_closest_department(tmp_path):
+    write_shards(tmp_path, ["内科", "外科"], [[1, 0, 0], [0, 1, 0]])
+    router = DepartmentRouter(str(tmp_path))
+    assert router.route([0.9, 0.1, 0]) == ["内科"]
+    assert router.route([0.1, 0.9, 0]) == ["外科"]
+
+
+def test_route_falls_back_when_ambiguous_or_dissimilar(tmp_path):
+    write_shards(tmp_path, ["内科", "外科"], [[1, 0, 0], [0, 1, 0]])
+    router = DepartmentRouter(str(tmp_path))
+    # 与两个质心同样接近：两个候选都在 margin 内，但不超过 ROUTER_MAX_SHARDS
+    assert sorted(router.route([1, 1, 0])) == ["内科", "外科"]
+    # 与所有质心都不相似
+    assert router.route([0, 0, 1]) == []
+    assert router.route([0, 0, 0]) == []
+
+
+def test_route_with_empty_manifest_returns_no_departments(tmp_path):
+    write_shards(tmp_path, [], [])
+    router = DepartmentRouter(str(tmp_path))
+    assert router.route(np.ones(768)) == []
+
+
+def test_route_falls_back_when_closest_centroid_has_no_shard(tmp_path):
+    # 眼科文档太少没建分片，无科室文档也没有分片，但都有质心
+    write_shards(tmp_path, ["内科", "外科"],
+                 [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]],
+                 centroid_names=["内科", "外科", "眼科", UNSHARDED])
+    router = DepartmentRouter(str(tmp_path))
+    assert router.route([0.9, 0.1, 0, 0]) == ["内科"]
+    assert router.route([0.6, 0, 0.8, 0]) == []
+    assert router.route([0, 0.6, 0, 0.8]) == []
+    # 分片科室与无分片科室同样接近：也回退
+    assert router.route([0, 1, 0, 1]) == []
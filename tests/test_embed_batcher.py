@@ -0,0 +1,77 @@
+# tests/test_embed_batcher.py
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from modules.embed_batcher import EmbeddingBatcher
+
+
+class FakeEmbed:
+    """记录每次调用的批次；可阻塞在 gate 上，便于在批次形成前排队"""
+
+    def __init__(self, gate=None, drop_last=False, fail=False):
+        self.gate = gate
+        self.drop_last = drop_last
+        self.fail = fail
+        self.batches = []
+        self.entered = threading.Event()
+
+    def __call__(self, texts):
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait()
+        self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("model failed")
+        vectors = [[float(len(t))] for t in texts]
+        return vectors[:-1] if self.drop_last else vectors
+
+
+def test_concurrent_queries_are_batched():
+    embed = FakeEmbed()
+    batcher = EmbeddingBatcher(embed, max_batch=8, max_wait_ms=50)
+    texts = [f"问题{i}" * (i + 1) for i in range(16)]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        vectors = list(pool.map(batcher.embed, texts))
+    assert vectors == [[float(len(t))] for t in texts]
+    assert all(len(b) <= 8 for b in embed.batches)
+    assert len(embed.batches) < 16
+    assert batcher.stats()["queries"] == 16
+
+
+def test_cancelled_future_does_not_kill_worker():
+    gate = threading.Event()
+    embed = FakeEmbed(gate=gate)
+    batcher = EmbeddingBatcher(embed, max_batch=8, max_wait_ms=1)
+    blocker = batcher.submit("占住后台线程")
+    assert embed.entered.wait(timeout=2)
+    cancelled = batcher.submit("取消的请求")
+    kept = batcher.submit("保留的请求")
+    assert cancelled.cancel()
+    gate.set()
+
+    assert blocker.result(timeout=2) == [float(len("占住后台线程"))]
+    assert kept.result(timeout=2) == [float(len("保留的请求"))]
+    assert "取消的请求" not in [t for b in embed.batches for t in b]
+    # 后台线程仍然存活
+    assert batcher.embed("之后的请求") == [float(len("之后的请求"))]
+
+
+def test_model_error_is_propagated_and_worker_survives():
+    embed = FakeEmbed(fail=True)
+    batcher = EmbeddingBatcher(embed, max_batch=4, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        batcher.submit("头疼").result(timeout=2)
+    embed.fail = False
+    assert batcher.submit("头疼").result(timeout=2) == [2.0]
+
+
+def test_short_result_fails_every_future_in_batch():
+    gate = threading.Event()
+    embed = FakeEmbed(gate=gate, drop_last=True)
+    batcher = EmbeddingBatcher(embed, max_batch=8, max_wait_ms=50)
+    futures = [batcher.submit(f"问题{i}") for i in range(3)]
+    gate.set()
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=2)
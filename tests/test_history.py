@@ -0,0 +1,71 @@
+# tests/test_history.py
+
+import json
+from modules.history import DialogueHistory, compact_assistant_content, estimate_tokens
+
+LONG_ANSWER = json.dumps({
+    "direct_reply": "这可能是普通感冒。" * 20,
+    "risk_level": "低",
+    "recommended_department": "呼吸内科",
+    "possible_causes": [{"name": "上呼吸道感染"}, {"name": "急性支气管炎"}],
+}, ensure_ascii=False)
+
+
+def test_compact_assistant_content_keeps_key_fields():
+    text = compact_assistant_content(LONG_ANSWER, max_chars=400)
+    assert "风险：低" in text
+    assert "建议科室：呼吸内科" in text
+    assert "上呼吸道感染、急性支气管炎" in text
+
+
+def test_token_count_stays_within_small_budget():
+    history = DialogueHistory(token_budget=100)
+    for i in range(10):
+        history.add_turn(f"第{i}个问题：" + "最近总是头疼失眠，" * 30, LONG_ANSWER)
+        assert history.token_count() <= 100
+
+
+def test_token_count_stays_within_default_budget():
+    history = DialogueHistory()
+    for i in range(30):
+        history.add_turn(f"第{i}个问题：咳嗽发烧怎么办" + "很严重" * i, LONG_ANSWER)
+        assert history.token_count() <= history.token_budget
+    # 早期回合折叠进摘要，最近一轮原样保留
+    messages = history.as_messages()
+    assert messages[0]["role"] == "system"
+    assert messages[-2]["content"].startswith("第29个问题")
+
+
+def test_summary_budget_clamped_to_total_budget():
+    history = DialogueHistory(token_budget=100, summary_budget=300)
+    assert history.summary_budget < 100
+
+
+def test_short_turns_are_not_clipped():
+    history = DialogueHistory()
+    history.add_turn("头疼怎么办", "多休息")
+    assert history.as_messages() == [
+        {"role": "user", "content": "头疼怎么办"},
+        {"role": "assistant", "content": "多休息"},
+    ]
+    assert estimate_tokens("头疼怎么办") == 5
+
+
+def test_old_turns_survive_in_condensed_summary():
+    history = DialogueHistory()
+    for i in range(40):
+        history.add_turn(f"第{i}问 孩子发烧咳嗽", LONG_ANSWER)
+        assert history.token_count() <= history.token_budget
+    summary = history.summary
+    # 最早的回合只剩问题要点，但仍在摘要中
+    assert summary.startswith("- 更早问过：第0问")
+    assert "第39问" not in summary
+
+
+def test_summary_appears_with_tiny_budget():
+    history = DialogueHistory(token_budget=50)
+    for i in range(20):
+        history.add_turn(f"第{i}问 头疼失眠怎么办", LONG_ANSWER)
+        assert history.token_count() <= 50
+    assert history.summary
+    assert history.as_messages()[0]["role"] == "system"
@@ -0,0 +1,71 @@
+# tests/test_logging_utils.py
+
+import json
+import logging
+from config import settings
+from modules.logging_utils import (
+    AUDIT_LOGGER, JsonFormatter, PayloadFilter, _audit_file_handler, audit)
+
+
+def make_record(msg, *args, **extra):
+    record = logging.LogRecord("modules.test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class CaptureHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_payload_records_are_sampled(monkeypatch):
+    log_filter = PayloadFilter()
+    monkeypatch.setattr(settings, "LOG_PAYLOAD_SAMPLE_RATE", 0.0)
+    assert not log_filter.filter(make_record("模型输出 %s", "内容", payload=True))
+    assert log_filter.filter(make_record("普通日志 %s", "内容"))
+
+    monkeypatch.setattr(settings, "LOG_PAYLOAD_SAMPLE_RATE", 1.0)
+    assert log_filter.filter(make_record("模型输出 %s", "内容", payload=True))
+
+
+def test_long_string_args_are_truncated(monkeypatch):
+    monkeypatch.setattr(settings, "LOG_MAX_PAYLOAD_CHARS", 5)
+    record = make_record("%s %s %d", "一二三四五六七", "短", 42)
+    assert PayloadFilter().filter(record)
+    assert record.args == ("一二三四五…（共 7 字）", "短", 42)
+    assert record.getMessage() == "一二三四五…（共 7 字） 短 42"
+
+
+def test_json_formatter_merges_fields():
+    entry = json.loads(JsonFormatter().format(make_record("llm_call", fields={"hedged": True})))
+    assert entry["msg"] == "llm_call" and entry["hedged"] is True
+
+
+def test_audit_goes_to_audit_logger_only():
+    capture, root_capture = CaptureHandler(), CaptureHandler()
+    audit_logger = logging.getLogger(AUDIT_LOGGER)
+    audit_logger.addHandler(capture)
+    logging.getLogger().addHandler(root_capture)
+    try:
+        audit("generate_answer", query="头疼", output="完整输出" * 200)
+    finally:
+        audit_logger.removeHandler(capture)
+        logging.getLogger().removeHandler(root_capture)
+
+    assert [r.getMessage() for r in capture.records] == ["generate_answer"]
+    assert capture.records[0].fields["output"] == "完整输出" * 200
+    assert not root_capture.records
+
+
+def test_audit_file_is_created_on_first_record(tmp_path):
+    path = tmp_path / "logs" / "audit.jsonl"
+    handler = _audit_file_handler(path)
+    assert not path.parent.exists()
+    handler.handle(make_record("generate_answer", fields={"output": "完整输出"}))
+    handler.close()
+    entry = json.loads(path.read_text(encoding="utf-8"))
+    assert entry["msg"] == "generate_answer" and entry["output"] == "完整输出"
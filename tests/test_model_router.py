@@ -0,0 +1,136 @@
+# tests/test_model_router.py
+
+import time
+import pytest
+from config import settings
+from modules.model_router import ModelRouter
+from scripts.mock_servers import MockLLMServer
+
+MESSAGES = [{"role": "user", "content": "最近持续低烧，咳嗽加重，有必要就医吗？"}]
+
+
+@pytest.fixture
+def router_settings(monkeypatch):
+    monkeypatch.setattr(settings, "HEDGE_DEFAULT_DELAY", 0.3)
+    monkeypatch.setattr(settings, "HEDGE_MIN_SAMPLES", 20)
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 0)
+    monkeypatch.setattr(settings, "FAST_MODEL", None)
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(**kwargs):
+        server = MockLLMServer(tokens_per_sec=500, **kwargs).start()
+        started.append(server)
+        return server
+
+    yield start
+    for server in started:
+        server.stop()
+
+
+def make_router(*servers, hedging=True):
+    endpoints = [{"name": s.name, "model": "mock", "base_url": s.url, "api_key": "k"}
+                 for s in servers]
+    return ModelRouter(endpoints=endpoints, hedging=hedging)
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_complete_without_hedging_uses_primary(router_settings, servers):
+    primary = servers(ttft=0.05, name="primary")
+    router = make_router(primary, hedging=False)
+    assert "上呼吸道感染" in router.complete(MESSAGES, model="mock")
+    assert router.hedges_fired == 0
+    assert router.endpoints[0].stats.samples == 1
+
+
+def test_stalled_loser_is_cancelled_and_ranked_down(router_settings, servers):
+    slow = servers(ttft=4.0, name="slow")
+    fast = servers(ttft=0.05, name="fast")
+    router = make_router(slow, fast)
+
+    start = time.perf_counter()
+    assert router.complete(MESSAGES, model="mock")
+    assert time.perf_counter() - start < 1.5
+    assert router.hedges_fired == 1 and router.hedges_won == 1
+
+    # 落败者在首字节之前就被断开，而不是等到 4 秒后
+    assert wait_for(lambda: slow.disconnects == 1, timeout=1.0)
+    assert time.perf_counter() - start < 2.0
+
+    # 落败者记入删失样本，排名落到后面
+    loser = router.endpoints[0]
+    assert wait_for(lambda: loser.stats.samples == 1)
+    assert loser.stats.percentile(50) >= settings.HEDGE_DEFAULT_DELAY
+    assert [e.name for e in router.ranked_endpoints("mock")] == ["fast", "slow"]
+
+
+def test_stream_hedges_on_first_token(router_settings, servers):
+    slow = servers(ttft=4.0, name="slow")
+    fast = servers(ttft=0.05, name="fast")
+    router = make_router(slow, fast)
+
+    start = time.perf_counter()
+    text = "".join(router.stream(MESSAGES, model="mock"))
+    assert "上呼吸道感染" in text
+    assert time.perf_counter() - start < 1.5
+    assert router.hedges_fired == 1
+    assert wait_for(lambda: slow.disconnects == 1, timeout=1.0)
+    assert wait_for(lambda: router.endpoints[0].ttft.samples == 1)
+    assert router.endpoints[1].ttft.samples == 1
+
+
+def test_fast_failure_hedges_and_failing_endpoint_ranks_last(router_settings, servers):
+    broken = servers(ttft=0.0, error_rate=1.0, name="broken")
+    healthy = servers(ttft=0.05, name="healthy")
+    router = make_router(broken, healthy)
+
+    assert router.complete(MESSAGES, model="mock")
+    assert router.failovers == 1 and router.hedges_fired == 0
+    assert router.endpoints[0].stats.error_rate == 1.0
+    assert [e.name for e in router.ranked_endpoints("mock")] == ["healthy", "broken"]
+
+
+def test_all_attempts_failing_raises(router_settings, servers):
+    broken = servers(ttft=0.0, error_rate=1.0, name="broken")
+    router = make_router(broken)
+    with pytest.raises(Exception):
+        router.complete(MESSAGES, model="mock")
+
+
+def test_pick_model_sends_short_questions_to_fast_model(router_settings, servers, monkeypatch):
+    router = make_router(servers(name="primary"))
+    monkeypatch.setattr(settings, "FAST_MODEL", "fast-model")
+    assert router.pick_model([{"role": "user", "content": "头疼"}]) == "fast-model"
+    long_question = [{"role": "user", "content": "最近持续低烧，咳嗽加重，晚上咳得睡不着，有必要就医吗？"}]
+    assert router.pick_model(long_question) == settings.DEFAULT_MODEL
+    assert router.pick_model(long_question, model="explicit") == "explicit"
+
+
+def test_failover_without_hedging_is_not_counted_as_hedge(router_settings, servers):
+    broken = servers(ttft=0.0, error_rate=1.0, name="broken")
+    healthy = servers(ttft=0.05, name="healthy")
+    router = make_router(broken, healthy, hedging=False)
+
+    assert router.complete(MESSAGES, model="mock")
+    assert router.failovers == 1
+    assert router.hedges_fired == 0 and router.hedges_won == 0
+
+
+def test_connections_reused_unless_model_has_several_endpoints(router_settings, servers):
+    a, b = servers(name="a"), servers(name="b")
+    single = make_router(a)
+    assert "Connection" not in single.endpoints[0].client.default_headers
+    # 运行时补建的端点同样复用连接
+    assert "Connection" not in single.ranked_endpoints("other")[0].client.default_headers
+
+    multi = make_router(a, b)
+    assert all(e.client.default_headers.get("Connection") == "close" for e in multi.endpoints)
@@ -0,0 +1,48 @@
+# tests/test_retrieval_pool.py
+
+import pytest
+from modules.retrieval_pool import RetrievalPool
+
+
+class StubRetriever:
+    """工作进程内的替身检索器：返回可辨认的结果与进程号"""
+
+    def hybrid_retrieve_with_score(self, query, top_k=5):
+        return [f"{query}#{i}" for i in range(top_k)], float(len(query))
+
+    def hybrid_retrieve(self, query, top_k=5):
+        return self.hybrid_retrieve_with_score(query, top_k)[0]
+
+    def hybrid_retrieve_many(self, queries, top_k=5):
+        return [self.hybrid_retrieve(q, top_k) for q in queries]
+
+
+def make_stub(torch_threads):
+    from config import settings
+    # 工作进程里审计日志必须已关闭
+    assert settings.AUDIT_ENABLED is False
+    return StubRetriever()
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = RetrievalPool(workers=2, factory=make_stub)
+    assert pool.warmup()
+    yield pool
+    pool.close()
+
+
+def test_pool_drops_in_for_hybrid_retrieve(pool):
+    stub = StubRetriever()
+    assert pool.hybrid_retrieve("头疼", top_k=3) == stub.hybrid_retrieve("头疼", top_k=3)
+    assert pool.submit("发烧", 2).result() == ["发烧#0", "发烧#1"]
+
+
+def test_pool_drops_in_for_hybrid_retrieve_with_score(pool):
+    assert pool.hybrid_retrieve_with_score("咳嗽很久", top_k=2) == (["咳嗽很久#0", "咳嗽很久#1"], 4.0)
+
+
+def test_pool_hybrid_retrieve_many_keeps_order(pool):
+    queries = [f"问题{i}" for i in range(7)]
+    assert pool.hybrid_retrieve_many(queries, top_k=1) == [[f"{q}#0"] for q in queries]
+    assert pool.hybrid_retrieve_many([], top_k=1) == []
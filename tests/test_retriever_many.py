@@ -0,0 +1,103 @@
+# tests/test_retriever_many.py
+
+import random
+import threading
+import zlib
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("langchain_huggingface")
+
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+from langchain_community.retrievers import BM25Retriever
+from config import settings
+from modules.department_router import DepartmentRouter
+from modules.retriever import MedicalRetrieverOffline
+from scripts.build_faiss import build_department_shards
+
+VOCAB = {
+    "内科": "发烧咳嗽感冒头疼乏力胸闷腹泻",
+    "外科": "骨折伤口缝合扭伤肿胀出血擦伤",
+    "眼科": "视力模糊眼睛干涩近视流泪红肿",
+}
+COMMON = "最近一直有点怎么办需要去医院吗严重"
+
+
+class CharHashEmbeddings(Embeddings):
+    """按字符哈希计数的确定性嵌入：用词相近的文本向量相近"""
+
+    def _embed(self, text):
+        vec = np.zeros(64, dtype=np.float32)
+        for ch in text:
+            vec[zlib.crc32(ch.encode("utf-8")) % 64] += 1
+        return (vec / max(np.linalg.norm(vec), 1e-12)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def sample(rng, chars, n):
+    return "".join(rng.choice(chars) for _ in range(n))
+
+
+@pytest.fixture
+def retriever(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SHARD_DB_PATH", str(tmp_path / "shards"))
+    monkeypatch.setattr(settings, "SHARD_MIN_DOCS", 50)
+    monkeypatch.setattr(settings, "ROUTER_MIN_SIMILARITY", 0.35)
+    monkeypatch.setattr(settings, "ROUTER_MAX_SHARDS", 1)
+
+    rng = random.Random(0)
+    embeddings = CharHashEmbeddings()
+    texts, metadatas = [], []
+    for dept, chars in VOCAB.items():
+        for i in range(100):
+            ask = sample(rng, chars, 6) + sample(rng, COMMON, 4)
+            texts.append(f"示例问：{ask}\n示例答：{dept}建议 {i}")
+            metadatas.append({"department": dept, "title": ask[:4]})
+    vectors = embeddings.embed_documents(texts)
+    build_department_shards(texts, vectors, metadatas, embeddings)
+
+    # 不加载真实模型与索引，直接装配检索器
+    r = MedicalRetrieverOffline.__new__(MedicalRetrieverOffline)
+    r.embeddings = embeddings
+    r.mmap_index = False
+    r.vector_db = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=metadatas)
+    r.router = DepartmentRouter()
+    r._shards = {}
+    r._shards_lock = threading.Lock()
+    r.bm25 = BM25Retriever.from_documents(
+        [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)])
+    return r
+
+
+def queries():
+    rng = random.Random(1)
+    focused = [sample(rng, chars, 5) + sample(rng, COMMON, 2) for chars in VOCAB.values() for _ in range(10)]
+    mixed = [sample(rng, "".join(VOCAB.values()) + COMMON, 8) for _ in range(20)]
+    return focused + mixed
+
+
+def contents(results):
+    return [[d.page_content for d in docs] for docs in results]
+
+
+@pytest.mark.parametrize("routed", [True, False])
+def test_hybrid_retrieve_many_matches_single(retriever, routed):
+    if not routed:
+        retriever.router = None
+    qs = queries()
+    single = [retriever.hybrid_retrieve(q, top_k=5) for q in qs]
+    many = retriever.hybrid_retrieve_many(qs, top_k=5)
+    assert contents(many) == contents(single)
+
+
+def test_queries_cover_routed_and_fallback_paths(retriever):
+    routes = [retriever.router.route(retriever.embeddings.embed_query(q)) for q in queries()]
+    assert any(routes) and not all(routes)
@@ -0,0 +1,49 @@
+# tests/test_stream_render.py
+
+import io
+from modules.stream_render import StreamRenderer, TerminalSink
+
+
+class RecordingSink:
+    def __init__(self):
+        self.updates = []
+
+    def update(self, renderer, delta, final):
+        self.updates.append((delta, final, renderer.text))
+
+
+def test_first_token_is_flushed_immediately_and_rest_coalesced():
+    sink = RecordingSink()
+    renderer = StreamRenderer(sink, interval=60.0, min_chars=10)
+    renderer.feed("你")
+    assert sink.updates == [("你", False, "你")]
+
+    for tok in ["好", "，", "请", "问"]:
+        renderer.feed(tok)
+    assert len(sink.updates) == 1          # 未到字数窗，不刷新
+
+    text = renderer.close()
+    assert text == "你好，请问"
+    assert sink.updates[-1] == ("好，请问", True, "你好，请问")
+    assert renderer.stats["tokens"] == 5 and renderer.stats["updates"] == 2
+    assert renderer.stats["first_visible_ms"] is not None
+
+
+def test_flushes_when_char_window_fills():
+    sink = RecordingSink()
+    renderer = StreamRenderer(sink, interval=60.0, min_chars=4)
+    renderer.render(["a", "bb", "cc", "d", "", "eeee"])
+    assert [u[0] for u in sink.updates] == ["a", "bbcc", "deeee", ""]
+    assert renderer.text == "abbccdeeee"
+
+
+def test_zero_interval_flushes_every_token():
+    sink = RecordingSink()
+    StreamRenderer(sink, interval=0.0, min_chars=1000).render(["一", "二", "三"])
+    assert [u[0] for u in sink.updates] == ["一", "二", "三", ""]
+
+
+def test_terminal_sink_writes_deltas_and_final_newline():
+    out = io.StringIO()
+    StreamRenderer(TerminalSink(out), interval=60.0, min_chars=2).render(["头", "疼", "吗"])
+    assert out.getvalue() == "头疼吗\n"
@@ -0,0 +1,129 @@
+# tests/test_web_router.py
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from config import settings
+from modules.web_router import CircuitBreaker, WebSearchRouter
+
+
+class FakeOnlineRetriever:
+    def __init__(self, latency=0.0, fail=False):
+        self.latency = latency
+        self.fail = fail
+
+    def hybrid_retrieve(self, query, top_k=5):
+        time.sleep(self.latency)
+        if self.fail:
+            raise ConnectionError("search failed")
+        return [f"{query}-{i}" for i in range(top_k)]
+
+
+@pytest.fixture
+def web_settings(monkeypatch):
+    monkeypatch.setattr(settings, "WEB_SEARCH_TIMEOUT", 0.5)
+    monkeypatch.setattr(settings, "WEB_SLOW_THRESHOLD", 0.2)
+    monkeypatch.setattr(settings, "WEB_BREAKER_FAILURES", 3)
+    monkeypatch.setattr(settings, "WEB_BREAKER_COOLDOWN", 0.2)
+    monkeypatch.setattr(settings, "WEB_SEARCH_MAX_WORKERS", 1)
+    monkeypatch.setattr(settings, "WEB_SKIP_MAX_DISTANCE", 60.0)
+
+
+def test_breaker_opens_after_threshold_and_probes_after_cooldown():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()          # 半开：放行一次试探
+    assert not breaker.allow()      # 试探未返回前不再放行
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_breaker_release_returns_probe_slot():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_decide_reasons(web_settings):
+    router = WebSearchRouter()
+    assert router.decide("2024年新版高血压指南", 10.0)["reason"] == "time_sensitive"
+    assert router.decide("头疼怎么办", 10.0)["reason"] == "local_sufficient"
+    assert router.decide("头疼怎么办", 100.0)["reason"] == "local_weak"
+    assert router.decide("头疼怎么办", None)["reason"] == "local_weak"
+
+
+def test_local_queueing_does_not_trip_breaker(web_settings):
+    # 单线程池 + 8 个并发会话：每次上游 50ms，排队最多约 400ms，超过过慢阈值
+    router = WebSearchRouter()
+    online = FakeOnlineRetriever(latency=0.05)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: router.search(online, f"问题{i}", None), range(8)))
+
+    decisions = [d for _, d in results]
+    assert all(d["outcome"] == "ok" for d in decisions)
+    assert all(d["latency_ms"] < 200 for d in decisions)
+    assert max(d["queue_ms"] for d in decisions) >= 200
+    assert router.breaker.state == "closed"
+
+
+def test_upstream_failures_and_slowness_trip_breaker(web_settings):
+    router = WebSearchRouter()
+    failing = FakeOnlineRetriever(fail=True)
+    for _ in range(2):
+        docs, decision = router.search(failing, "头疼怎么办", None)
+        assert docs == [] and decision["outcome"].startswith("error")
+    _, decision = router.search(FakeOnlineRetriever(latency=0.3), "头疼怎么办", None)
+    assert decision["outcome"] == "slow"
+    assert router.breaker.state == "open"
+
+    _, decision = router.search(FakeOnlineRetriever(), "头疼怎么办", None)
+    assert decision["reason"] == "circuit_open" and "outcome" not in decision
+
+
+def test_upstream_timeout_trips_breaker(web_settings, monkeypatch):
+    monkeypatch.setattr(settings, "WEB_BREAKER_FAILURES", 1)
+    router = WebSearchRouter()
+    _, decision = router.search(FakeOnlineRetriever(latency=0.7), "头疼怎么办", None)
+    assert decision["outcome"] == "timeout"
+    assert router.breaker.state == "open"
+
+
+class HungOnlineRetriever:
+    """永不返回（直到测试结束）的上游"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def hybrid_retrieve(self, query, top_k=5):
+        self.release.wait()
+        return []
+
+
+def test_hung_upstream_reopens_breaker(web_settings, monkeypatch):
+    monkeypatch.setattr(settings, "WEB_SEARCH_TIMEOUT", 0.1)
+    monkeypatch.setattr(settings, "WEB_SLOW_THRESHOLD", 0.05)
+    router = WebSearchRouter()
+    online = HungOnlineRetriever()
+    try:
+        outcomes = [router.search(online, "头疼怎么办", None)[1]["outcome"] for _ in range(3)]
+        # 第一次卡在上游；之后排在被占住的线程后面
+        assert outcomes == ["timeout", "queue_timeout", "queue_timeout"]
+        assert router.breaker.state == "open"
+        assert router.search(online, "头疼怎么办", None)[1]["reason"] == "circuit_open"
+
+        # 冷却后的试探仍排在卡住的线程后面：重新熔断，而不是一直半开
+        time.sleep(settings.WEB_BREAKER_COOLDOWN + 0.05)
+        _, decision = router.search(online, "头疼怎么办", None)
+        assert decision["breaker"] == "half_open" and decision["outcome"] == "queue_timeout"
+        assert router.breaker.state == "open"
+        assert router.search(online, "头疼怎么办", None)[1]["reason"] == "circuit_open"
+    finally:
+        online.release.set()